@@ -0,0 +1,87 @@
+"""Compare the vectorized batch scoring with scoring members one by one in Python.
+
+Usage (from the bot directory):
+    python -m benchmarks.batch_scoring [members]
+"""
+import bisect
+import datetime
+import random
+import sys
+import timeit
+from types import SimpleNamespace
+
+import discord
+import numpy as np
+from core.scoring import SIGNAL_WEIGHTS, BatchScorer
+
+JOIN_DELTA_THRESHOLD = 86400
+CLUSTER_WINDOW = 300.0
+CLUSTER_SIZE = 3
+
+
+def make_members(count: int) -> list[SimpleNamespace]:
+    """Fake members with the attributes used by the per member path, like during a raid:
+    half of them are accounts created in a few bursts in the last hours."""
+    rng = random.Random(0)
+    now = discord.utils.utcnow()
+    members = []
+    for index in range(count):
+        if index % 2:
+            created_at = now - datetime.timedelta(hours=rng.randint(1, 5), seconds=rng.random() * 60)
+        else:
+            created_at = now - datetime.timedelta(days=rng.randint(30, 3000), seconds=rng.random() * 86400)
+        user_id = discord.utils.time_snowflake(created_at) + index
+        members.append(
+            SimpleNamespace(
+                id=user_id,
+                created_at=discord.utils.snowflake_time(user_id),
+                joined_at=now - datetime.timedelta(seconds=rng.random() * 600),
+            )
+        )
+    return members
+
+
+def score_one_by_one(members: list[SimpleNamespace]) -> list[float]:
+    created = sorted(member.created_at for member in members)
+    window = datetime.timedelta(seconds=CLUSTER_WINDOW)
+    scores = []
+    for member in members:
+        join_delta = (member.joined_at - member.created_at).total_seconds()
+        cluster = (
+            bisect.bisect_right(created, member.created_at + window)
+            - bisect.bisect_left(created, member.created_at - window)
+            - 1
+        )
+        scores.append(
+            SIGNAL_WEIGHTS["young_account"] * (join_delta < JOIN_DELTA_THRESHOLD)
+            + SIGNAL_WEIGHTS["clustered_creation"] * (cluster >= CLUSTER_SIZE)
+        )
+    return scores
+
+
+def score_batch(members: list[SimpleNamespace]) -> np.ndarray:
+    user_ids = np.fromiter((member.id for member in members), dtype=np.uint64, count=len(members))
+    joined_at = np.fromiter((member.joined_at.timestamp() for member in members), dtype=np.float64, count=len(members))
+    scorer = BatchScorer(
+        join_delta_threshold=JOIN_DELTA_THRESHOLD,
+        cluster_window=CLUSTER_WINDOW,
+        cluster_size=CLUSTER_SIZE,
+    )
+    return scorer.score(user_ids, joined_at)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    members = make_members(count)
+
+    # Both paths must agree before comparing them
+    np.testing.assert_allclose(score_batch(members), score_one_by_one(members))
+
+    for name, function in (("one by one", score_one_by_one), ("batch", score_batch)):
+        runs, total = timeit.Timer(lambda: function(members)).autorange()
+        per_batch = total / runs
+        print(f"{name:<10} {per_batch * 1000:8.3f} ms/batch  {per_batch / count * 1e6:8.3f} us/member")
+
+
+if __name__ == "__main__":
+    main()
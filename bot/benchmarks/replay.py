@@ -0,0 +1,224 @@
+"""Replay recorded member events through the join guard, and compare the verdicts of two runs.
+
+The events are recorded with the `diagnostics record` command. Run the replay once per build
+or config set, then diff the two verdict files. At 10x or max speed the time windows of the
+name and avatar trackers are compressed as well, so compare runs made at the same speed.
+
+Usage (from the bot directory):
+    python -m benchmarks.replay run member_events.jsonl verdicts.jsonl [--speed 1|10|max] [--config config.json]
+    python -m benchmarks.replay diff verdicts_a.jsonl verdicts_b.jsonl
+
+The config file is a JSON object with the JoinGuardConfig fields to override, applied to every guild.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+from cogs.joinguard import JoinGuard
+from core.journal import JoinEvent
+from core.models import JoinGuardConfig
+from core.recording import JOIN, MemberEvent, read_events
+from core.settings import GuildSettingsTable
+from loguru import logger
+
+
+class FakeAsset:
+    def __init__(self, key: str | None, animated: bool = False) -> None:
+        self.key = key
+        self._animated = animated
+
+    def is_animated(self) -> bool:
+        return self._animated
+
+
+class FakeMember:
+    """A member built from a recorded event, with the attributes the join guard reads."""
+
+    def __init__(self, event: MemberEvent) -> None:
+        self.id = event.u
+        self.name = event.n
+        self.bot = event.b
+        self.guild = SimpleNamespace(id=event.g)
+        self.avatar = FakeAsset(event.a) if event.a else None
+        self.display_avatar = FakeAsset(event.a, animated=event.x)
+        self.created_at = discord.utils.snowflake_time(event.u)
+        self.joined_at = (
+            datetime.datetime.fromtimestamp(event.j, tz=datetime.timezone.utc) if event.j is not None else None
+        )
+        self._mobile = event.m
+
+    def is_on_mobile(self) -> bool:
+        return self._mobile
+
+    def __str__(self) -> str:
+        return self.name
+
+    async def send(self, *args, **kwargs) -> None:
+        # DMs can't be known from a recording, every member is considered to have them open
+        return None
+
+
+class VerdictJournal:
+    """Keeps the last verdict instead of writing it to the database, stands for the journal and the outbox."""
+
+    def __init__(self) -> None:
+        self.last: JoinEvent | None = None
+
+    def record(self, event: JoinEvent) -> bool:
+        self.last = event
+        return True
+
+    async def record_verdict(self, event: JoinEvent, messages: list) -> None:
+        self.last = event
+
+    def has_handler(self, kind: str) -> bool:
+        return False
+
+
+class FakePool:
+    async def fetch(self, query: str, *args: Any) -> list:
+        # Nobody completed a verification in the recording
+        return []
+
+
+class FakeBot:
+    def __init__(self, settings: GuildSettingsTable) -> None:
+        self.settings = settings
+        self.pool = FakePool()
+        self.join_journal = self.outbox = VerdictJournal()
+        self.join_stats = SimpleNamespace(record=lambda *args, **kwargs: None)
+
+    async def fetch_user(self, user_id: int) -> SimpleNamespace:
+        return SimpleNamespace(id=user_id, banner=None)
+
+
+async def replay(events: list[MemberEvent], config: dict, speed: float | None) -> list[dict]:
+    settings = GuildSettingsTable()
+    for guild_id in {event.g for event in events}:
+        settings.put_join_guard_config(JoinGuardConfig(guild_id=guild_id, **{"is_enabled": True, **config}))
+    bot = FakeBot(settings)
+    guard = JoinGuard(bot)  # type: ignore
+
+    verdicts = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for index, event in enumerate(events):
+        if speed is not None:
+            await asyncio.sleep(max(0.0, start + (event.t - events[0].t) / speed - loop.time()))
+
+        member = FakeMember(event)
+        if event.k != JOIN:
+            await guard.on_member_remove(member)  # type: ignore
+            continue
+        if member.bot:
+            # Ignored by the listener before reaching the checks
+            continue
+        # Done by the listener before queuing the member
+        guard.hops.record(member.id, member.guild.id)
+
+        bot.join_journal.last = None
+        began = time.perf_counter()
+        await guard.handle_join(member)  # type: ignore
+        latency = time.perf_counter() - began
+        verdict = bot.join_journal.last
+        verdicts.append(
+            {
+                "i": index,
+                "g": event.g,
+                "u": event.u,
+                "action": verdict.action if verdict else "skipped",
+                "score": verdict.score if verdict else None,
+                "signals": verdict.signals if verdict else {},
+                "latency": latency,
+            }
+        )
+    return verdicts
+
+
+def read_verdicts(path: str) -> dict[int, dict]:
+    with open(path, encoding="utf-8") as file:
+        return {verdict["i"]: verdict for verdict in map(json.loads, file)}
+
+
+def latency_summary(verdicts) -> str:
+    latencies = sorted(verdict["latency"] * 1e6 for verdict in verdicts)
+    if len(latencies) < 2:
+        return "not enough joins"
+    p50, p95, p99 = (statistics.quantiles(latencies, n=100)[q - 1] for q in (50, 95, 99))
+    return f"p50 {p50:8.1f} us  p95 {p95:8.1f} us  p99 {p99:8.1f} us  max {latencies[-1]:8.1f} us"
+
+
+def run(args: argparse.Namespace) -> None:
+    events = list(read_events(args.recording))
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as file:
+            config = json.load(file)
+    speed = None if args.speed == "max" else float(args.speed)
+
+    start = time.perf_counter()
+    verdicts = asyncio.run(replay(events, config, speed))
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        for verdict in verdicts:
+            file.write(json.dumps(verdict, separators=(",", ":")) + "\n")
+
+    actions: dict[str, int] = {}
+    for verdict in verdicts:
+        actions[verdict["action"]] = actions.get(verdict["action"], 0) + 1
+    print(f"events: {len(events)}, joins: {len(verdicts)}, replayed in {elapsed:.2f}s")
+    print(f"verdicts: {', '.join(f'{action} {count}' for action, count in sorted(actions.items()))}")
+    print(f"latency: {latency_summary(verdicts)}")
+
+
+def diff(args: argparse.Namespace) -> None:
+    before, after = read_verdicts(args.before), read_verdicts(args.after)
+    common = sorted(before.keys() & after.keys())
+    changed = [index for index in common if before[index]["action"] != after[index]["action"]]
+    rescored = [index for index in common if before[index]["score"] != after[index]["score"]]
+
+    print(f"joins: {len(common)} compared, {len(before.keys() ^ after.keys())} only in one run")
+    print(f"verdicts changed: {len(changed)}, scores changed: {len(rescored)}")
+    for index in changed[: args.limit]:
+        old, new = before[index], after[index]
+        print(
+            f"  #{index} user {old['u']} in {old['g']}: {old['action']} ({old['score']}) -> {new['action']} ({new['score']})"
+        )
+    print(f"before: {latency_summary(before.values())}")
+    print(f"after:  {latency_summary(after.values())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay")
+    commands = parser.add_subparsers(required=True)
+
+    run_parser = commands.add_parser("run", help="Replay a recording and write the verdicts.")
+    run_parser.add_argument("recording")
+    run_parser.add_argument("output")
+    run_parser.add_argument("--speed", default="max", choices=["1", "10", "max"])
+    run_parser.add_argument("--config", help="A JSON file with the JoinGuardConfig fields to override.")
+    run_parser.set_defaults(func=run)
+
+    diff_parser = commands.add_parser("diff", help="Compare the verdicts of two runs.")
+    diff_parser.add_argument("before")
+    diff_parser.add_argument("after")
+    diff_parser.add_argument("--limit", type=int, default=20, help="How many changed verdicts to list.")
+    diff_parser.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    # The join guard logs every join at debug level
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the default and performance runtime profiles: gateway payload decoding and event loop startup.
+
+Usage (from the bot directory):
+    python -m benchmarks.runtime_profile [members in the GUILD_CREATE payload]
+"""
+import asyncio
+import json
+import sys
+import time
+import timeit
+
+from core.runtime import RuntimeProfile, create_web_client
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop  # type: ignore
+except ImportError:
+    uvloop = None
+
+
+def make_member(index: int) -> dict:
+    return {
+        "user": {
+            "id": str(1000000000000000000 + index),
+            "username": f"member{index}",
+            "discriminator": f"{index % 10000:04}",
+            "avatar": f"{index:032x}",
+            "public_flags": 0,
+        },
+        "roles": [str(2000000000000000000 + role) for role in range(index % 4)],
+        "joined_at": "2023-03-08T23:55:13.000000+00:00",
+        "nick": None,
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def make_payloads(members: int) -> dict[str, str]:
+    member_add = {"op": 0, "s": 1, "t": "GUILD_MEMBER_ADD", "d": {**make_member(0), "guild_id": "296214474791190529"}}
+    message = {
+        "op": 0,
+        "s": 2,
+        "t": "MESSAGE_CREATE",
+        "d": {
+            "id": "1083187000000000000",
+            "channel_id": "1083180000000000000",
+            "author": make_member(1)["user"],
+            "content": "Hello there! " * 20,
+            "embeds": [],
+            "attachments": [],
+            "mentions": [],
+        },
+    }
+    guild_create = {
+        "op": 0,
+        "s": 3,
+        "t": "GUILD_CREATE",
+        "d": {"id": "296214474791190529", "name": "Guild", "members": [make_member(i) for i in range(members)]},
+    }
+    return {
+        name: json.dumps(payload)
+        for name, payload in (("member_add", member_add), ("message", message), ("guild_create", guild_create))
+    }
+
+
+def bench_decoding(payloads: dict[str, str]) -> None:
+    decoders = {"json": json.loads}
+    if orjson is not None:
+        decoders["orjson"] = orjson.loads
+    else:
+        print("orjson is not installed, only json is measured")
+
+    for name, payload in payloads.items():
+        results = []
+        for decoder_name, decode in decoders.items():
+            number, total = timeit.Timer(lambda: decode(payload)).autorange()
+            per_payload = total / number
+            results.append(
+                f"{decoder_name} {per_payload * 1e6:10.1f} us ({len(payload) / per_payload / 1e6:7.1f} MB/s)"
+            )
+        print(f"{name:>13} ({len(payload) / 1024:8.1f} KiB): {'  '.join(results)}")
+
+
+async def startup(profile: RuntimeProfile, tasks: int) -> float:
+    """Create the web client and run a burst of tasks, like the first seconds after connecting."""
+    start = time.perf_counter()
+    async with create_web_client(profile):
+        await asyncio.gather(*(asyncio.sleep(0) for _ in range(tasks)))
+    return time.perf_counter() - start
+
+
+def bench_startup(tasks: int = 50_000) -> None:
+    profiles = [("default", RuntimeProfile("default"), asyncio.DefaultEventLoopPolicy())]
+    if uvloop is not None:
+        profiles.append(
+            ("performance", RuntimeProfile("performance", uvloop=True, tuned_connector=True), uvloop.EventLoopPolicy())
+        )
+    else:
+        print("uvloop is not installed, only the default loop is measured")
+
+    for name, profile, policy in profiles:
+        asyncio.set_event_loop_policy(policy)
+        start = time.perf_counter()
+        elapsed = asyncio.run(startup(profile, tasks))
+        total = time.perf_counter() - start
+        print(f"{name:>13}: {tasks} tasks in {elapsed * 1000:7.1f} ms, {total * 1000:7.1f} ms with the loop creation")
+    asyncio.set_event_loop_policy(None)
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    bench_decoding(make_payloads(members))
+    bench_startup()
+
+
+if __name__ == "__main__":
+    main()
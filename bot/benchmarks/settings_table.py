@@ -0,0 +1,71 @@
+"""Compare the memory used to keep the settings of every guild in memory.
+
+Usage (from the bot directory):
+    python -m benchmarks.settings_table [guilds]
+"""
+import random
+import sys
+import tracemalloc
+
+from core.models import GuildConfig, JoinGuardConfig
+from core.settings import GuildSettingsTable
+
+LOCALES = ["en-US", "pt-BR", None]
+
+
+def make_configs(guilds: int) -> list[tuple[GuildConfig, JoinGuardConfig]]:
+    rng = random.Random(0)
+    configs = []
+    for index in range(guilds):
+        guild_id = 100000000000000000 + index
+        configs.append(
+            (
+                GuildConfig(
+                    guild_id=guild_id,
+                    locale=rng.choice(LOCALES),
+                    entry_log_channel_id=guild_id + 1 if rng.random() < 0.5 else None,
+                    setup_complete=rng.random() < 0.8,
+                ),
+                JoinGuardConfig(guild_id=guild_id, is_enabled=rng.random() < 0.5, nitro=rng.choice([True, None])),
+            )
+        )
+    return configs
+
+
+def measure(build) -> tuple[int, object]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def build_dataclasses(guilds: int):
+    configs = {}
+    for guild_config, join_guard_config in make_configs(guilds):
+        configs[guild_config.guild_id] = (guild_config, join_guard_config)
+    return configs
+
+
+def build_table(guilds: int):
+    table = GuildSettingsTable()
+    for guild_config, join_guard_config in make_configs(guilds):
+        table.put_guild_config(guild_config)
+        table.put_join_guard_config(join_guard_config)
+    return table
+
+
+def main():
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    dataclasses_size, _ = measure(lambda: build_dataclasses(guilds))
+    table_size, table = measure(lambda: build_table(guilds))
+
+    print(f"guilds: {guilds}")
+    print(f"dataclasses: {dataclasses_size / guilds:8.1f} bytes/guild")
+    print(f"table:       {table_size / guilds:8.1f} bytes/guild (columns and index: {table.nbytes() / guilds:.1f})")  # type: ignore
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Measure how fast the setup handlers respond to their interactions under database and Discord API latency.
+
+Every setup action, and the /setup command, is run with fake interactions whose requests
+sleep for the injected latency. The time to first response is when Discord receives the
+first response or defer, half the round trip after the request is sent, and the
+interaction fails if it is 3 seconds or more. Each action is run once without the
+automatic defer, then `--repeat` times with it, so the projections learn from the first runs.
+
+Usage (from the bot directory):
+    python -m benchmarks.setup_interactions [--profile fast|slow_db|slow_api ...] [--repeat 3]
+    python -m benchmarks.setup_interactions --db 0.5 --api 1.0
+"""
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+
+import discord
+from cogs.guilds import VANITY_INVITE, Guilds, SetupState, _setup_actions
+from core.interactions import INTERACTION_DEADLINE
+from core.l10n import Localization
+from loguru import logger
+
+GUILD_ID = 296214474791190529
+CHANNEL_ID = 1083180000000000000
+
+
+@dataclass(frozen=True)
+class Latency:
+    # Seconds per database query
+    db: float
+    # Round trip of a Discord API request, Discord receives it halfway
+    api: float
+
+
+PROFILES = {
+    "fast": Latency(db=0.005, api=0.15),
+    "slow_db": Latency(db=3.0, api=0.15),
+    "slow_api": Latency(db=0.005, api=2.0),
+}
+
+# The state and the selected values of the component of each action
+SCENARIOS: dict[str, tuple[SetupState, list[str]]] = {
+    "cancel": (SetupState(), []),
+    "confirm": (SetupState(log_channel_id=CHANNEL_ID, invite="AbCdEf"), []),
+    "vanity_invite": (SetupState(log_channel_id=CHANNEL_ID), []),
+    "generate_invite": (SetupState(log_channel_id=CHANNEL_ID), []),
+    "invite_channel": (SetupState(log_channel_id=CHANNEL_ID), [str(CHANNEL_ID)]),
+    "log_channel": (SetupState(), [str(CHANNEL_ID)]),
+    "skip_log_channel": (SetupState(), []),
+    "continue_permissions": (SetupState(), []),
+    "retry_permissions": (SetupState(), []),
+    "continue_intro": (SetupState(), []),
+    "restart": (SetupState(), []),
+}
+SETUP_COMMAND = "/setup"
+
+
+class FakePool:
+    def __init__(self, latency: Latency) -> None:
+        self.latency = latency
+
+    async def fetchrow(self, query: str, *args: Any) -> dict:
+        await asyncio.sleep(self.latency.db)
+        return {
+            "guild_id": GUILD_ID,
+            "locale": None,
+            "use_vanity_invite": False,
+            "custom_invite_code": None,
+            "entry_log_channel_id": CHANNEL_ID,
+            "verification_log_channel_id": None,
+            "setup_complete": False,
+        }
+
+
+class FakeChannel:
+    def __init__(self, latency: Latency) -> None:
+        self.id = CHANNEL_ID
+        self.latency = latency
+
+    def permissions_for(self, member: Any) -> discord.Permissions:
+        return discord.Permissions.all()
+
+    async def create_invite(self, **kwargs: Any) -> SimpleNamespace:
+        await asyncio.sleep(self.latency.api)
+        return SimpleNamespace(code="AbCdEf")
+
+
+class FakeGuild:
+    def __init__(self, channel: FakeChannel) -> None:
+        self.id = GUILD_ID
+        self.vanity_url = f"https://discord.gg/{VANITY_INVITE}"
+        self.me = SimpleNamespace(guild_permissions=discord.Permissions.all())
+        self._channel = channel
+
+    def get_channel_or_thread(self, channel_id: int) -> FakeChannel | None:
+        return self._channel if channel_id == self._channel.id else None
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction") -> None:
+        self._interaction = interaction
+        self._type: str | None = None
+
+    def is_done(self) -> bool:
+        return self._type is not None
+
+    async def _respond(self, kind: str) -> None:
+        if self._type is not None:
+            raise discord.InteractionResponded(self._interaction)  # type: ignore
+        # Like discord.py, the response is only marked as done once the request returns
+        await self._interaction.request(kind, acknowledges=True)
+        self._type = kind
+
+    async def defer(self, **kwargs: Any) -> None:
+        await self._respond("defer")
+
+    async def edit_message(self, **kwargs: Any) -> None:
+        await self._respond("edit_message")
+
+    async def send_message(self, **kwargs: Any) -> None:
+        await self._respond("send_message")
+
+
+class FakeInteraction:
+    """A component interaction whose responses take the round trip of the injected API latency."""
+
+    def __init__(self, client: SimpleNamespace, custom_id: str, values: list[str]) -> None:
+        self.client = client
+        self.guild = client.guild
+        self.guild_id = GUILD_ID
+        self.locale = discord.Locale.american_english
+        # The setup actions are only run for members who can manage the guild
+        self.permissions = discord.Permissions.all()
+        self.type = discord.InteractionType.component
+        self.data = {"custom_id": custom_id, "values": values}
+        self.extras: dict[str, Any] = {}
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(self)
+        self.followup = SimpleNamespace(send=self._followup_send)
+
+        self.start = time.perf_counter()
+        self.acknowledged_at: float | None = None
+        self.acknowledged_by: str | None = None
+
+    async def request(self, kind: str, acknowledges: bool = False) -> None:
+        half_trip = self.client.latency.api / 2
+        await asyncio.sleep(half_trip)
+        if acknowledges:
+            if self.acknowledged_at is not None:
+                raise RuntimeError(f"{kind}: interaction already acknowledged by {self.acknowledged_by}")
+            self.acknowledged_at = time.perf_counter() - self.start
+            self.acknowledged_by = kind
+        elif self.acknowledged_at is None:
+            raise RuntimeError(f"{kind}: unknown webhook, the interaction was not acknowledged")
+        await asyncio.sleep(half_trip)
+
+    async def edit_original_response(self, **kwargs: Any) -> None:
+        await self.request("edit_original_response")
+
+    async def _followup_send(self, **kwargs: Any) -> None:
+        await self.request("followup")
+
+
+def make_client(l10n: Localization, latency: Latency) -> SimpleNamespace:
+    channel = FakeChannel(latency)
+    return SimpleNamespace(
+        l10n=l10n,
+        latency=latency,
+        pool=FakePool(latency),
+        settings=SimpleNamespace(put_guild_config=lambda config: None),
+        guild=FakeGuild(channel),
+        get_channel=lambda channel_id: channel if channel_id == CHANNEL_ID else None,
+    )
+
+
+@dataclass
+class Result:
+    first_response: float | None
+    kind: str | None
+    error: str | None = None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"{'error':>9} {self.error[:40]}"
+        if self.first_response is None:
+            return f"{'none':>9}"
+        missed = " MISSED" if self.first_response >= INTERACTION_DEADLINE else ""
+        return f"{self.first_response * 1000:7.0f}ms {self.kind}{missed}"
+
+
+async def run_action(client: SimpleNamespace, name: str, cog: Guilds | None) -> Result:
+    if name == SETUP_COMMAND:
+        interaction = FakeInteraction(client, "", [])
+        handler: Callable[[], Awaitable[Any]] = lambda: Guilds._start_setup(interaction)  # type: ignore
+        if cog is not None:
+            handler = lambda: cog.auto_defer.run("setup_command", interaction, Guilds._start_setup)  # type: ignore
+    else:
+        state, values = SCENARIOS[name]
+        interaction = FakeInteraction(client, state.custom_id(name), values)
+        handler = lambda: _setup_actions[name](interaction, state)  # type: ignore
+        if cog is not None:
+            handler = lambda: cog.on_interaction(interaction)  # type: ignore
+
+    error = None
+    try:
+        await handler()
+    except Exception as e:
+        error = str(e)
+    return Result(interaction.acknowledged_at, interaction.acknowledged_by, error)
+
+
+async def run_profile(l10n: Localization, name: str, latency: Latency, repeat: int) -> None:
+    client = make_client(l10n, latency)
+    actions = [*SCENARIOS, SETUP_COMMAND]
+    print(f"\n{name}: {latency.db * 1000:.0f}ms per query, {latency.api * 1000:.0f}ms per API round trip")
+
+    without_guard = await asyncio.gather(*(run_action(client, action, None) for action in actions))
+    # The same cog for every run, so the projections of the automatic defer carry over
+    cog = Guilds(client)  # type: ignore
+    with_guard = []
+    for _ in range(repeat):
+        with_guard.append(await asyncio.gather(*(run_action(client, action, cog) for action in actions)))
+
+    print(f"{'action':>21}  {'without auto defer':<30}  {'auto defer, first run':<30}  auto defer, last run")
+    for index, action in enumerate(actions):
+        print(
+            f"{action:>21}  {str(without_guard[index]):<30}  {str(with_guard[0][index]):<30}  {with_guard[-1][index]}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    l10n = Localization()
+    l10n.load_localization(["en-US"])
+    l10n.set_default_locale("en-US")
+    l10n.parse_all()
+
+    if args.db is not None or args.api is not None:
+        profiles = {"custom": Latency(db=args.db or 0.0, api=args.api or 0.0)}
+    else:
+        profiles = {name: PROFILES[name] for name in args.profile or PROFILES}
+    for name, latency in profiles.items():
+        await run_profile(l10n, name, latency, args.repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.setup_interactions")
+    parser.add_argument("--profile", action="append", choices=list(PROFILES), help="Defaults to every profile.")
+    parser.add_argument("--db", type=float, help="A custom latency per database query, in seconds.")
+    parser.add_argument("--api", type=float, help="A custom latency per API round trip, in seconds.")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to run the actions with auto defer.")
+    args = parser.parse_args()
+    # The deferred interactions are logged at debug level
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure the username similarity index with a full window of joiners.
+
+Usage (from the bot directory):
+    python -m benchmarks.username_index [joiners]
+"""
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+from core.similarity import MinHasher, RecentNamesIndex, normalize_username, shingles
+
+TEMPLATES = ["raider", "freenitro", "xXgamerXx", "discord_mod", "steam.gift"]
+
+
+def make_names(count: int) -> list[str]:
+    """Half random names and half templated raider names."""
+    rng = random.Random(0)
+    names = []
+    for index in range(count):
+        if index % 2:
+            names.append(f"{rng.choice(TEMPLATES)}{rng.randint(0, 99999)}")
+        else:
+            names.append("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 14))))
+    return names
+
+
+def brute_force_similar(names: list[str], name: str, threshold: float = 0.5) -> int:
+    target = shingles(normalize_username(name))
+    count = 0
+    for other in names:
+        other_shingles = shingles(normalize_username(other))
+        if len(target & other_shingles) / len(target | other_shingles) >= threshold:
+            count += 1
+    return count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    names = make_names(count)
+    index = RecentNamesIndex(MinHasher(), window=600, max_entries=count)
+
+    start = time.perf_counter()
+    for name in names:
+        index.add(name, now=0)
+    insert = time.perf_counter() - start
+
+    # Build it again while tracing allocations, as tracing slows down the inserts
+    tracemalloc.start()
+    traced_index = RecentNamesIndex(index.hasher, window=600, max_entries=count)
+    for name in names:
+        traced_index.add(name, now=0)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    queries = names[:200]
+    start = time.perf_counter()
+    for name in queries:
+        index.count_similar(name, now=0)
+    query = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    for name in queries[:20]:
+        brute_force_similar(names, name)
+    brute_force = (time.perf_counter() - start) / 20
+
+    print(f"joiners in window: {len(index)}")
+    print(f"insert:      {insert / count * 1e6:10.1f} us/joiner")
+    print(f"query:       {query * 1e6:10.1f} us/query")
+    print(f"brute force: {brute_force * 1e6:10.1f} us/query")
+    print(f"memory:      {memory / count:10.1f} bytes/joiner")
+    print(
+        f"templated name matches: {index.count_similar('raider123', now=0)}, random: {index.count_similar('qzwxv', now=0)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
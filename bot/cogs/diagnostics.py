@@ -0,0 +1,173 @@
+import asyncio
+import io
+from typing import TYPE_CHECKING
+
+import discord
+from core.profiling import SamplingProfiler, profile_calls
+from core.recording import JOIN, REMOVE, MemberEventRecorder
+from core.scheduler import FairScheduler
+from discord.ext import commands
+from helpers.context import GatekeeperContext
+from helpers.memory import estimate_guild_footprint, format_bytes, get_rss
+
+if TYPE_CHECKING:
+    from main import GatekeeperBot
+
+
+class Diagnostics(commands.Cog):
+    """Owner only commands to inspect the state of the running bot."""
+
+    def __init__(self, bot: "GatekeeperBot") -> None:
+        self.bot = bot
+        self.recorder: MemberEventRecorder | None = None
+        self._profiling = asyncio.Lock()
+
+    async def cog_unload(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+
+    async def cog_check(self, ctx: GatekeeperContext) -> bool:  # type: ignore
+        return await self.bot.is_owner(ctx.author)
+
+    @commands.group(name="diagnostics", aliases=["diag"], invoke_without_command=True)
+    async def diagnostics(self, ctx: GatekeeperContext):
+        await ctx.send_help(ctx.command)
+
+    @diagnostics.command(name="memory")
+    async def memory(self, ctx: GatekeeperContext, limit: int = 10):
+        """Show the resident memory of the bot and the estimated footprint per guild."""
+        footprints = sorted(
+            ((estimate_guild_footprint(guild), guild) for guild in self.bot.guilds),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        total = sum(size for size, _ in footprints)
+        members = sum(len(guild.members) for guild in self.bot.guilds)
+
+        lines = [
+            f"RSS: {format_bytes(get_rss())}",
+            f"Guilds: {len(footprints)}, cached members: {members}",
+            f"Estimated guild state: {format_bytes(total)}",
+            "",
+        ]
+        for size, guild in footprints[:limit]:
+            lines.append(f"{format_bytes(size):>11} {len(guild.members):>7} members  {guild.name} ({guild.id})")
+
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    @diagnostics.command(name="startup")
+    async def startup(self, ctx: GatekeeperContext):
+        """Show how long each phase of the last startup took."""
+        timeline = self.bot.startup_timeline
+        await ctx.send(f"```\n{timeline.report()}\n\ntotal {timeline.total:.3f}s\n```")
+
+    @diagnostics.command(name="checks")
+    async def checks(self, ctx: GatekeeperContext, guild_id: int | None = None):
+        """Show the join guard checks of a guild, in the order they run, with their statistics."""
+        join_guard = self.bot.get_cog("JoinGuard")
+        if join_guard is None:
+            return await ctx.send("The join guard is not loaded.")
+        guild_id = guild_id or (ctx.guild.id if ctx.guild else None)
+        plan = join_guard.plans.get(guild_id)  # type: ignore
+        if plan is None:
+            return await ctx.send("No member joined this guild with the join guard enabled yet.")
+        await ctx.send(f"```\n{plan.report()}\n```")
+
+    @diagnostics.command(name="queues")
+    async def queues(self, ctx: GatekeeperContext, limit: int = 10):
+        """Show the join queue depth and wait times of the busiest guilds."""
+        join_guard = self.bot.get_cog("JoinGuard")
+        if join_guard is None:
+            return await ctx.send("The join guard is not loaded.")
+        await ctx.send(f"```\n{join_guard.scheduler.report(limit)}\n```")  # type: ignore
+
+    @diagnostics.command(name="record")
+    async def record(self, ctx: GatekeeperContext, path: str = "member_events.jsonl", anonymize: bool = True):
+        """Start or stop recording the member join and remove events, to replay them with benchmarks.replay."""
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+            return await ctx.send(f"Stopped recording, {recorder.events} events written to `{recorder.path}`")
+
+        self.recorder = MemberEventRecorder(path, anonymize=anonymize)
+        await ctx.send(f"Recording the member events to `{path}`{' anonymized' if anonymize else ''}")
+
+    @diagnostics.command(name="profile")
+    async def profile(self, ctx: GatekeeperContext, seconds: float = 10.0, listener: str | None = None):
+        """Sample the event loop for some seconds and send the stacks in the collapsed format.
+
+        Pass a listener, or the handler of a cog scheduler like `JoinGuard.handle_join`, to only keep
+        the samples taken while it runs. `JoinGuard.on_member_join` only queues the members.
+        """
+        if self._profiling.locked():
+            return await ctx.send("A profile is already running.")
+        seconds = min(max(seconds, 1.0), 300.0)
+
+        async with self._profiling:
+            profiler = SamplingProfiler(asyncio.get_running_loop())
+            if listener is None:
+                with profiler:
+                    await asyncio.sleep(seconds)
+                summary = f"{profiler.total} samples in {seconds:g}s"
+            else:
+                scheduler = self._find_scheduler(listener)
+                found = self._find_listener(listener) if scheduler is None else None
+                if scheduler is not None:
+                    # The workers call the handler they were given, not the method of the cog
+                    original = scheduler.handler
+                    wrapper = scheduler.handler = profile_calls(profiler, original)
+                    try:
+                        with profiler:
+                            await asyncio.sleep(seconds)
+                    finally:
+                        scheduler.handler = original
+                elif found is not None:
+                    event, original = found
+                    wrapper = profile_calls(profiler, original)
+                    listeners = self.bot.extra_events[event]
+                    listeners[listeners.index(original)] = wrapper
+                    try:
+                        with profiler:
+                            await asyncio.sleep(seconds)
+                    finally:
+                        listeners[listeners.index(wrapper)] = original
+                else:
+                    return await ctx.send(f"Could not find the listener or handler `{listener}`.")
+                summary = (
+                    f"{profiler.total} samples in {wrapper.calls} calls of {listener}, "  # type: ignore
+                    f"{wrapper.elapsed:.3f}s spent in it"  # type: ignore
+                )
+
+        file = discord.File(io.BytesIO(profiler.collapsed().encode()), filename="profile.collapsed")
+        await ctx.send(f"{summary}. Open it with speedscope or flamegraph.pl.", file=file)
+
+    def _find_scheduler(self, name: str) -> FairScheduler | None:
+        cog_name, _, method_name = name.partition(".")
+        scheduler = getattr(self.bot.get_cog(cog_name), "scheduler", None)
+        if isinstance(scheduler, FairScheduler) and getattr(scheduler.handler, "__name__", None) == method_name:
+            return scheduler
+        return None
+
+    def _find_listener(self, name: str):
+        cog_name, _, method_name = name.partition(".")
+        cog = self.bot.get_cog(cog_name)
+        if cog is None:
+            return None
+        for event, method in cog.get_listeners():
+            if method.__name__ == method_name and method in self.bot.extra_events.get(event, []):
+                return event, method
+        return None
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        if self.recorder is not None:
+            self.recorder.record(JOIN, member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        if self.recorder is not None:
+            self.recorder.record(REMOVE, member)
+
+
+async def setup(bot: "GatekeeperBot"):
+    await bot.add_cog(Diagnostics(bot))
@@ -1,8 +1,12 @@
-from typing import TYPE_CHECKING
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 
 import discord
 from core import models
+from core.interactions import AutoDefer, edit_response, send_response
 from core.l10n import Localization
+from core.reconciliation import reconcile_guilds
 from discord import Embed, app_commands
 from discord.ext import commands
 from helpers.emojis import Emojis
@@ -23,7 +27,20 @@ REQUIRED_PERMISSIONS = [
     "add_reactions",
 ]
 
-VIEWS_TIMEOUT = 600
+VANITY_INVITE = "vanity"
+
+SetupActionHandler = Callable[[discord.Interaction, "SetupState"], Awaitable[Any]]
+_setup_actions: dict[str, SetupActionHandler] = {}
+
+
+def setup_action(name: str) -> Callable[[SetupActionHandler], SetupActionHandler]:
+    """Register a function as the handler of the setup components with the action `name`."""
+
+    def decorator(func: SetupActionHandler) -> SetupActionHandler:
+        _setup_actions[name] = func
+        return func
+
+    return decorator
 
 
 class BotCannotSeeChannel(Exception):
@@ -32,131 +49,176 @@ class BotCannotSeeChannel(Exception):
     pass
 
 
-class SetupBaseView(discord.ui.View):
+@dataclass(frozen=True)
+class SetupState:
+    """The choices made so far in a setup, encoded in the custom_id of the setup components."""
+
+    log_channel_id: int | None = None
+    # VANITY_INVITE or the code of the generated invite
+    invite: str | None = None
+
+    def custom_id(self, action: str) -> str:
+        """Build the custom_id of a component, e.g. "setup:confirm:3f2a9c0b1e40001:AbCdEf"."""
+        return f"setup:{action}:{self.log_channel_id or 0:x}:{self.invite or ''}"
+
+    @classmethod
+    def from_custom_id(cls, custom_id: str) -> tuple[str, "SetupState"] | None:
+        """Get the action and the state from the custom_id of a component.
+
+        Returns:
+            tuple[str, SetupState] | None: The action and the state, or None if it is not a setup component.
+        """
+        prefix, _, rest = custom_id.partition(":")
+        if prefix != "setup":
+            return None
+        action, _, rest = rest.partition(":")
+        log_channel_id, _, invite = rest.partition(":")
+        try:
+            return action, cls(log_channel_id=int(log_channel_id or "0", 16) or None, invite=invite or None)
+        except ValueError:
+            return None
+
+
+class SetupBaseView(discord.ui.View, ABC):
     """Base view for the setup process.
     Used to display the cancel button in all views.
+
+    Views are only used to render the components of a step, they are never kept in memory.
+    Each component has its action and the `SetupState` in its custom_id and the clicks are
+    routed by `Guilds.on_interaction` to the handlers registered with `setup_action`,
+    so a setup costs nothing while it is waiting and survives restarts.
     """
 
-    def __init__(self, *, last_interaction: discord.Interaction | None = None):
-        self.last_interaction = last_interaction
-        _ = None
-        if last_interaction:
-            bot = get_bot_from_interaction(last_interaction)
-            _ = bot.l10n.get_localization(last_interaction.locale).format
-
-        # This is a workaround to make the cancel button always the last button.
-        for index, item in enumerate(self.__view_children_items__):
-            if "style" not in item.__discord_ui_model_kwargs__:
-                continue
-            if item.__discord_ui_model_kwargs__["style"] == discord.ButtonStyle.red:
-                self.__view_children_items__.append(self.__view_children_items__.pop(index))
-                break
-
-        super().__init__(timeout=VIEWS_TIMEOUT)
-
-        # Translate the labels of the buttons and selects
-        for index, item in enumerate(self.children):
-            if _ is None:
-                break
-            if isinstance(item, discord.ui.Button):
-                item.label = _(item.label)  # type: ignore
-            if isinstance(item, discord.ui.ChannelSelect):
-                item.placeholder = _(item.placeholder)  # type: ignore
-
-    def disable_timeout(self):
-        """Disable the timeout of the view."""
-        self.timeout = None
-
-    async def on_timeout(self) -> None:
-        """Called when the view times out."""
-        # Disable all buttons
-        if self.last_interaction is not None:
-            for item in self.children:
-                item.disabled = True  # type: ignore
-            await self.last_interaction.edit_original_response(view=self)
-
-    @discord.ui.button(label="setup_button.cancel", style=discord.ButtonStyle.red)
-    async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    def __init__(self, interaction: discord.Interaction, state: SetupState = SetupState()):
+        super().__init__(timeout=None)
+        self.interaction = interaction
+        self.state = state
+        bot = get_bot_from_interaction(interaction)
+        self._ = bot.l10n.get_localization(interaction.locale).format
+
+        self.add_items()
+        # The cancel button is always the last button
+        self.add_button("setup_button.cancel", discord.ButtonStyle.red, "cancel")
+
+    def add_items(self) -> None:
+        """Add the components of the step, called before adding the cancel button."""
+        pass
+
+    def add_button(self, label: str, style: discord.ButtonStyle, action: str) -> None:
+        self.add_item(discord.ui.Button(label=self._(label), style=style, custom_id=self.state.custom_id(action)))
+
+    def add_channel_select(self, placeholder: str, action: str) -> None:
+        self.add_item(
+            discord.ui.ChannelSelect(placeholder=self._(placeholder), custom_id=self.state.custom_id(action), row=0)
+        )
+
+    @abstractmethod
+    def embed(self) -> discord.Embed:
+        """Create the embed of the step."""
+
+    async def send(self, interaction: discord.Interaction) -> None:
+        """Send this step as the response of an interaction."""
+        await send_response(interaction, embed=self.embed(), view=self)
+        # The clicks are routed by the custom_id, so the view doesn't need to be stored
+        self.stop()
+
+    async def edit(self, interaction: discord.Interaction) -> None:
+        """Replace the message of a component interaction with this step."""
+        self.stop()
+        await edit_response(interaction, embed=self.embed(), view=self)
+
+    @staticmethod
+    @setup_action("cancel")
+    async def cancel_button(interaction: discord.Interaction, state: SetupState):
         bot = get_bot_from_interaction(interaction)
         _ = bot.l10n.get_localization(interaction.locale).format
-        self.disable_timeout()
-        await interaction.response.edit_message(content=_("setup_button.cancel_pressed"), embed=None, view=None)
+        await edit_response(interaction, content=_("setup_button.cancel_pressed"), embed=None, view=None)
+
+
+def _get_selected_channel_id(interaction: discord.Interaction) -> int:
+    return int(interaction.data["values"][0])  # type: ignore
+
+
+def _get_invite_url(guild: discord.Guild, state: SetupState) -> str | None:
+    if state.invite == VANITY_INVITE:
+        return guild.vanity_url
+    if state.invite:
+        return f"https://discord.gg/{state.invite}"
+    return None
 
 
 class SetupConfirmationView(SetupBaseView):
-    def embed(
-        self,
-        l10n: Localization,
-        locale: discord.Locale,
-        invite_url: str,
-        log_channel: discord.app_commands.AppCommandChannel | discord.app_commands.AppCommandThread | None,
-    ):
+    def add_items(self) -> None:
+        self.add_button("setup_button.continue", discord.ButtonStyle.green, "confirm")
+
+    def embed(self):
         """Create the embed for this view."""
-        _ = l10n.get_localization(locale).format
+        _ = self._
         embed = discord.Embed(title=_("setup_confirmation_view.title"))
         embed.description = _(
             "setup_confirmation_view.description",
             {
-                "log_channel": log_channel.mention if log_channel else "No channel set.",
-                "invite": invite_url,
+                "log_channel": f"<#{self.state.log_channel_id}>" if self.state.log_channel_id else "No channel set.",
+                "invite": _get_invite_url(self.interaction.guild, self.state),  # type: ignore
             },
         )
         embed.set_footer(text=_("setup_confirmation_view.footer"))
         return embed
 
-    async def _update_guild_setup_status(self, guild_id: int):
-        bot = get_bot_from_interaction(self.last_interaction)  # type: ignore
-        """Update the guild setup status."""
-        guild = await models.GuildConfig.get(pool=bot.pool, guild_id=guild_id)
+    @staticmethod
+    async def _update_guild_setup_status(bot: "GatekeeperBot", guild_id: int, state: SetupState):
+        """Save every choice of the setup and mark it as complete, in a single statement."""
+        values = {
+            "entry_log_channel_id": state.log_channel_id,
+            "use_vanity_invite": state.invite == VANITY_INVITE,
+            "setup_complete": True,
+        }
+        if state.invite and state.invite != VANITY_INVITE:
+            values["custom_invite_code"] = state.invite
+        guild = await models.GuildConfig.update(bot.pool, guild_id, **values)
         if guild is not None:
-            guild.setup_complete = True
-            await guild.save(pool=bot.pool)
+            bot.settings.put_guild_config(guild)
             return True
         logger.warning(f"Guild {guild_id} not found in the database when updating setup status to True.")
         return False
 
-    @discord.ui.button(label="setup_button.continue", style=discord.ButtonStyle.green)
-    async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @staticmethod
+    @setup_action("confirm")
+    async def confirm_button(interaction: discord.Interaction, state: SetupState):
         bot = get_bot_from_interaction(interaction)
         _ = bot.l10n.get_localization(interaction.locale).format
-        self.disable_timeout()
-        result = await self._update_guild_setup_status(interaction.guild.id)  # type: ignore
+        result = await SetupConfirmationView._update_guild_setup_status(bot, interaction.guild.id, state)  # type: ignore
         if result:
             embed = discord.Embed(
                 title=_("setup_confirmation_view.confirmed_embed_title"),
                 description=_("setup_confirmation_view.confirmed_embed_description"),
                 color=discord.Color.green(),
             )
-            await interaction.response.edit_message(embed=embed, view=None)
+            await edit_response(interaction, embed=embed, view=None)
         else:
-            await interaction.response.edit_message(
-                content=_("setup_confirmation_view.confirmed_error"), embed=None, view=None
+            await edit_response(
+                interaction, content=_("setup_confirmation_view.confirmation_error"), embed=None, view=None
             )
 
 
 class SetupInviteView(SetupBaseView):
-    def __init__(
-        self,
-        *,
-        last_interaction: discord.Interaction | None = None,
-        channel_select: bool = False,
-        log_channel: discord.app_commands.AppCommandChannel | discord.app_commands.AppCommandThread | None,
-    ):
-        super().__init__(last_interaction=last_interaction)
-        self.log_channel = log_channel
-
-        self.vanity_url = last_interaction.guild.vanity_url  # type: ignore
-        if last_interaction.guild.vanity_url is None:  # type: ignore
-            self.remove_item(self.vanity_invite_button)
-
-        if channel_select:
-            self.remove_item(self.generate_invite_button)
-        else:
-            self.remove_item(self.invite_channel_select)
-
-    def embed(self, l10n: Localization, locale: discord.Locale):
+    def __init__(self, interaction: discord.Interaction, state: SetupState, *, channel_select: bool = False):
+        self.channel_select = channel_select
+        self.vanity_url = interaction.guild.vanity_url  # type: ignore
+        super().__init__(interaction, state)
+
+    def add_items(self) -> None:
+        # The select takes the whole first row, so it has to be added before the buttons
+        if self.channel_select:
+            self.add_channel_select("setup_invite_view.select_placeholder", "invite_channel")
+        if self.vanity_url is not None:
+            self.add_button("setup_invite_view.vanity_invite_button", discord.ButtonStyle.blurple, "vanity_invite")
+        if not self.channel_select:
+            self.add_button("setup_invite_view.generate_invite_button", discord.ButtonStyle.blurple, "generate_invite")
+
+    def embed(self):
         """Create the embed for this view."""
-        _ = l10n.get_localization(locale).format
+        _ = self._
         embed = discord.Embed(title=_("setup_invite_view.title"))
         embed.description = _(
             "setup_invite_view.description",
@@ -173,7 +235,8 @@ class SetupInviteView(SetupBaseView):
         )
         return embed
 
-    def _check_permissions(self, guild: discord.Guild, channel_id: int) -> bool:
+    @staticmethod
+    def _check_permissions(guild: discord.Guild, channel_id: int) -> bool:
         """Check if the bot has the required permissions in the selected channel."""
         resolved_channel = guild.get_channel_or_thread(channel_id)
         if resolved_channel:
@@ -181,95 +244,71 @@ class SetupInviteView(SetupBaseView):
         else:
             raise BotCannotSeeChannel("The bot can't see the channel.")
 
-    async def update_guild_config_invite(self, guild_id: int, invite_code: str | None = None, vanity: bool = False):
-        bot = get_bot_from_interaction(self.last_interaction)  # type: ignore
-        guild = await models.GuildConfig.get(pool=bot.pool, guild_id=guild_id)
-        if guild is not None:
-            if vanity:
-                guild.use_vanity_invite = True
-            elif invite_code is not None:
-                guild.custom_invite_code = invite_code
-            await guild.save(pool=bot.pool)
-            return True
-        logger.warning(
-            f"Guild {guild_id} not found in the database when trying to update the invite code during setup."
-        )
-        return False
-
-    @discord.ui.button(label="setup_invite_view.vanity_invite_button", style=discord.ButtonStyle.blurple)
-    async def vanity_invite_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @staticmethod
+    @setup_action("vanity_invite")
+    async def vanity_invite_button(interaction: discord.Interaction, state: SetupState):
         """Called when the user selects the vanity invite button."""
-        bot = get_bot_from_interaction(interaction)
-        _ = bot.l10n.get_localization(interaction.locale).format
+        state = SetupState(log_channel_id=state.log_channel_id, invite=VANITY_INVITE)
+        await SetupConfirmationView(interaction, state).edit(interaction)
 
-        view = SetupConfirmationView(last_interaction=interaction)
-        embed = view.embed(bot.l10n, interaction.locale, invite_url=self.vanity_url, log_channel=self.log_channel)  # type: ignore
-
-        self.disable_timeout()
-
-        await interaction.response.edit_message(embed=embed, view=view)
-
-    @discord.ui.button(label="setup_invite_view.generate_invite_button", style=discord.ButtonStyle.blurple)
-    async def generate_invite_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        bot = get_bot_from_interaction(interaction)
-        _ = bot.l10n.get_localization(interaction.locale).format
-
-        view = SetupInviteView(last_interaction=interaction, channel_select=True, log_channel=self.log_channel)
-        embed = view.embed(bot.l10n, interaction.locale)
-
-        self.disable_timeout()
-
-        await interaction.response.edit_message(embed=embed, view=view)
+    @staticmethod
+    @setup_action("generate_invite")
+    async def generate_invite_button(interaction: discord.Interaction, state: SetupState):
+        await SetupInviteView(interaction, state, channel_select=True).edit(interaction)
 
-    @discord.ui.select(cls=discord.ui.ChannelSelect, placeholder="setup_invite_view.select_placeholder", row=0)
-    async def invite_channel_select(self, interaction: discord.Interaction, select: discord.ui.ChannelSelect):
+    @staticmethod
+    @setup_action("invite_channel")
+    async def invite_channel_select(interaction: discord.Interaction, state: SetupState):
         """Called when the user selects a channel."""
         bot = get_bot_from_interaction(interaction)
         _ = bot.l10n.get_localization(interaction.locale).format
-        channel = select.values[0]
+        channel_id = _get_selected_channel_id(interaction)
         if interaction.guild is None:
             return
         try:
-            has_permissions = self._check_permissions(interaction.guild, channel.id)
+            has_permissions = SetupInviteView._check_permissions(interaction.guild, channel_id)
         except BotCannotSeeChannel:
-            return await interaction.response.send_message(
-                content=_("setup_invite_view.error_cannot_see_channel"), ephemeral=True
+            return await send_response(
+                interaction, content=_("setup_invite_view.error_cannot_see_channel"), ephemeral=True
             )
 
         if has_permissions:
-            resolved_channel = bot.get_channel(channel.id)
+            resolved_channel = bot.get_channel(channel_id)
             if not resolved_channel:
-                return await interaction.response.send_message(
-                    content=_("setup_invite_view.error_get_channel"), ephemeral=True
+                return await send_response(
+                    interaction, content=_("setup_invite_view.error_get_channel"), ephemeral=True
                 )
             if isinstance(resolved_channel, (discord.Thread, discord.abc.PrivateChannel)):
-                return await interaction.response.send_message(
-                    content=_("setup_invite_view.error_cannot_be_thread"), ephemeral=True
+                return await send_response(
+                    interaction, content=_("setup_invite_view.error_cannot_be_thread"), ephemeral=True
                 )
 
             invite = await resolved_channel.create_invite(reason="Join Guard invite", unique=True)
-            await self.update_guild_config_invite(guild_id=interaction.guild.id, invite_code=invite.code)
-
-            view = SetupConfirmationView(last_interaction=interaction)
-            embed = view.embed(bot.l10n, interaction.locale, invite_url=invite.url, log_channel=self.log_channel)
-            self.disable_timeout()
-            return await interaction.response.edit_message(embed=embed, view=view)
+            state = SetupState(log_channel_id=state.log_channel_id, invite=invite.code)
+            return await SetupConfirmationView(interaction, state).edit(interaction)
 
         else:
-            await interaction.response.send_message(
-                content=_("setup_invite_view.error_no_permissions", {"channel": channel.mention}), ephemeral=True
+            await send_response(
+                interaction,
+                content=_("setup_invite_view.error_no_permissions", {"channel": f"<#{channel_id}>"}),
+                ephemeral=True,
             )
 
 
 class SetupLogChannelView(SetupBaseView):
-    def embed(self, l10n: Localization, locale: discord.Locale):
+    def add_items(self) -> None:
+        self.add_channel_select("setup_log_view.placeholder", "log_channel")
+        self.add_button("setup_button.skip", discord.ButtonStyle.gray, "skip_log_channel")
+
+    def embed(self):
         """Create the embed for this view."""
-        _ = l10n.get_localization(locale).format
+        _ = self._
         embed = discord.Embed(title=_("setup_log_view.title"), description=_("setup_log_view.description"))
         embed.set_footer(text=_("setup_log_view.footer"))
         return embed
 
-    def _check_permissions(self, guild: discord.Guild, channel_id: int):
+    @staticmethod
+    def _check_permissions(guild: discord.Guild, channel_id: int):
         """Check if the bot has the required permissions in the selected channel."""
         resolved_channel = guild.get_channel_or_thread(channel_id)
         if resolved_channel:
@@ -277,94 +316,77 @@ class SetupLogChannelView(SetupBaseView):
         else:
             raise BotCannotSeeChannel("The bot can't see the channel.")
 
-    async def update_guild_config(self, guild_id: int, channel_id: int):
-        bot = get_bot_from_interaction(self.last_interaction)  # type: ignore
-
-        guild = await models.GuildConfig.get(pool=bot.pool, guild_id=guild_id)
-        if guild is not None:
-            guild.entry_log_channel_id = channel_id
-            await guild.save(pool=bot.pool)
-            return True
-
-        logger.warning(f"Guild {guild_id} not found in database when trying to update log channel during setup")
-        return False
-
-    @discord.ui.select(cls=discord.ui.ChannelSelect, placeholder="setup_log_view.placeholder")
-    async def log_channel_select(self, interaction: discord.Interaction, select: discord.ui.ChannelSelect):
+    @staticmethod
+    @setup_action("log_channel")
+    async def log_channel_select(interaction: discord.Interaction, state: SetupState):
         """Called when the user selects a channel."""
         bot = get_bot_from_interaction(interaction)
         _ = bot.l10n.get_localization(interaction.locale).format
-        self.channel = select.values[0]
+        channel_id = _get_selected_channel_id(interaction)
 
         try:
-            has_permissions = self._check_permissions(interaction.guild, self.channel.id)  # type: ignore
+            has_permissions = SetupLogChannelView._check_permissions(interaction.guild, channel_id)  # type: ignore
         except BotCannotSeeChannel:
-            return await interaction.response.send_message(
-                content=_("setup_log_view.error_cannot_see_channel"), ephemeral=True
+            return await send_response(
+                interaction, content=_("setup_log_view.error_cannot_see_channel"), ephemeral=True
             )
 
         if has_permissions:
-            view = SetupInviteView(last_interaction=interaction, log_channel=self.channel)
-            embed = view.embed(bot.l10n, interaction.locale)
-
-            self.disable_timeout()
+            return await SetupInviteView(interaction, SetupState(log_channel_id=channel_id)).edit(interaction)
 
-            return await interaction.response.edit_message(embed=embed, view=view)
-
-        await interaction.response.send_message(
-            content=_("setup_log_view.error_no_permissions", {"channel": self.channel.mention}),
+        await send_response(
+            interaction,
+            content=_("setup_log_view.error_no_permissions", {"channel": f"<#{channel_id}>"}),
             ephemeral=True,
         )
         # TODO: Maybe delete the message after a channel is actually selected?
 
-    @discord.ui.button(label="setup_button.skip", style=discord.ButtonStyle.gray)
-    async def skip_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @staticmethod
+    @setup_action("skip_log_channel")
+    async def skip_button(interaction: discord.Interaction, state: SetupState):
         """Called when the user selects the skip button."""
-        bot = get_bot_from_interaction(interaction)
-        view = SetupInviteView(last_interaction=interaction, log_channel=None)
-        embed = view.embed(bot.l10n, interaction.locale)
-
-        self.disable_timeout()
-
-        await interaction.response.edit_message(embed=embed, view=view)
+        await SetupInviteView(interaction, SetupState()).edit(interaction)
 
 
 class SetupPermissionsView(SetupBaseView):
     """View used to check if the bot has the required permissions."""
 
-    def embed(self, l10n: Localization, locale: discord.Locale):
-        _ = l10n.get_localization(locale).format
-        missing_permissions = self._check_missing_permissions()
-        if missing_permissions:
-            self.remove_item(self.continue_button)
+    def add_items(self) -> None:
+        self.missing_permissions = self._check_missing_permissions()
+        if self.missing_permissions:
+            self.add_button("setup_button.retry", discord.ButtonStyle.grey, "retry_permissions")
+        else:
+            self.add_button("setup_button.continue", discord.ButtonStyle.green, "continue_permissions")
+
+    def embed(self):
+        _ = self._
+        if self.missing_permissions:
             return discord.Embed(
                 title=_("setup_permissions_embed.title"),
                 description=_(
                     "setup_permissions_embed.description_missing_permissions",
-                    {"permissions": self._format_permissions(l10n, locale)},
+                    {"permissions": self._format_permissions()},
                 ),
                 color=discord.Color.red(),
             ).set_footer(text=_("setup_permissions_embed.footer_missing_permissions"))
         else:
-            self.remove_item(self.retry_button)
             return discord.Embed(
                 title=_("setup_permissions_embed.title"),
                 description=_(
                     "setup_permissions_embed.description_has_permissions",
-                    {"permissions": self._format_permissions(l10n, locale)},
+                    {"permissions": self._format_permissions()},
                 ),
                 color=discord.Color.green(),
             ).set_footer(text=_("setup_permissions_embed.footer_has_permissions"))
 
-    def _format_permissions(self, localization: Localization, locale: discord.Locale):
-        _ = localization.get_localization(locale).format
-        missing_permissions = self._check_missing_permissions()
+    def _format_permissions(self):
+        _ = self._
 
         list_to_join = []
         for permission in REQUIRED_PERMISSIONS:
             localizated_permission = _(f"permissions.{permission}")
 
-            if permission in missing_permissions:
+            if permission in self.missing_permissions:
                 list_to_join.append(f"{Emojis.small_x_mark} {localizated_permission}")
             else:
                 list_to_join.append(f"{Emojis.small_check_mark} {localizated_permission}")
@@ -373,36 +395,28 @@ class SetupPermissionsView(SetupBaseView):
 
     def _check_missing_permissions(self):
         """Check which permissions are missing and return a list of them."""
-        guild_permissions = self.last_interaction.guild.me.guild_permissions  # type: ignore
+        guild_permissions = self.interaction.guild.me.guild_permissions  # type: ignore
         return [permission for permission in REQUIRED_PERMISSIONS if not getattr(guild_permissions, permission)]
 
-    @discord.ui.button(label="setup_button.continue", style=discord.ButtonStyle.green)
-    async def continue_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        bot = get_bot_from_interaction(interaction)
-        view = SetupLogChannelView(last_interaction=interaction)
-        embed = view.embed(bot.l10n, interaction.locale)
-
-        self.disable_timeout()
-
-        await interaction.response.edit_message(embed=embed, view=view)
-
-    @discord.ui.button(label="setup_button.retry", style=discord.ButtonStyle.grey)
-    async def retry_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        bot = get_bot_from_interaction(interaction)
-        view = SetupPermissionsView(last_interaction=interaction)
-        embed = view.embed(bot.l10n, interaction.locale)
-
-        self.disable_timeout()
+    @staticmethod
+    @setup_action("continue_permissions")
+    async def continue_button(interaction: discord.Interaction, state: SetupState):
+        await SetupLogChannelView(interaction).edit(interaction)
 
-        await interaction.response.edit_message(embed=embed, view=view)
+    @staticmethod
+    @setup_action("retry_permissions")
+    async def retry_button(interaction: discord.Interaction, state: SetupState):
+        await SetupPermissionsView(interaction).edit(interaction)
 
 
 class SetupIntroView(SetupBaseView):
     """View used to display the intro of the setup process."""
 
-    @staticmethod
-    def embed(l10n: Localization, locale: discord.Locale):
-        _ = l10n.get_localization(locale).format
+    def add_items(self) -> None:
+        self.add_button("setup_button.continue", discord.ButtonStyle.green, "continue_intro")
+
+    def embed(self):
+        _ = self._
         return (
             discord.Embed(
                 title=_("setup_intro_embed.title"),
@@ -427,36 +441,28 @@ class SetupIntroView(SetupBaseView):
             .set_footer(text=_("setup_intro_embed.footer"))
         )
 
-    @discord.ui.button(label="setup_button.continue", style=discord.ButtonStyle.green)
-    async def continue_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        bot = get_bot_from_interaction(interaction)
-        view = SetupPermissionsView(last_interaction=interaction)
-        embed = view.embed(bot.l10n, interaction.locale)
-        # Disable the timeout because we don't want this view to expire anymore
-        # We will handle the timeout only in the next view
-        self.disable_timeout()
-
-        await interaction.response.edit_message(embed=embed, view=view)
+    @staticmethod
+    @setup_action("continue_intro")
+    async def continue_button(interaction: discord.Interaction, state: SetupState):
+        await SetupPermissionsView(interaction).edit(interaction)
 
 
 class SetupAlreadyDone(SetupBaseView):
-    def embed(self, l10n: Localization, locale: discord.Locale):
-        _ = l10n.get_localization(locale).format
+    def add_items(self) -> None:
+        self.add_button("setup_button.continue", discord.ButtonStyle.green, "restart")
+
+    def embed(self):
+        _ = self._
         return discord.Embed(
             title=_("setup_already_done.title"),
             description=_("setup_already_done.description"),
             color=discord.Color.yellow(),
         ).set_footer(text=_("setup_already_done.footer"))
 
-    @discord.ui.button(label="setup_button.continue", style=discord.ButtonStyle.green)
-    async def continue_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        bot = get_bot_from_interaction(interaction)
-        view = SetupIntroView(last_interaction=interaction)
-        embed = view.embed(bot.l10n, interaction.locale)
-
-        self.disable_timeout()
-
-        await interaction.response.edit_message(embed=embed, view=view)
+    @staticmethod
+    @setup_action("restart")
+    async def continue_button(interaction: discord.Interaction, state: SetupState):
+        await SetupIntroView(interaction).edit(interaction)
 
 
 def thank_you_embed(l10n: Localization, locale: discord.Locale):
@@ -470,16 +476,27 @@ def thank_you_embed(l10n: Localization, locale: discord.Locale):
 class Guilds(commands.Cog):
     def __init__(self, bot: "GatekeeperBot"):
         self.bot = bot
+        self.auto_defer = AutoDefer()
 
     @commands.Cog.listener()
-    async def on_guild_join(self, guild: discord.Guild):
-        guild_config = await models.GuildConfig.get(self.bot.pool, guild.id)
-        first_time = False
+    async def on_ready(self):
+        """Bring the guilds table up to date with the guilds the bot joined or left while it was offline."""
+        try:
+            report = await reconcile_guilds(self.bot.pool, [guild.id for guild in self.bot.guilds])
+        except Exception:
+            logger.exception("Error while reconciling the guilds table")
+            return
 
-        if guild_config is None:
-            first_time = True
-            guild_config = models.GuildConfig(guild_id=guild.id)
-            await guild_config.save(self.bot.pool)
+        for guild_config in (*report.inserted, *report.rejoined):
+            self.bot.settings.put_guild_config(guild_config)
+        for guild_id in report.departed:
+            self.bot.settings.remove(guild_id)
+        logger.info(str(report))
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        guild_config, first_time = await models.GuildConfig.restore(self.bot.pool, guild.id)
+        self.bot.settings.put_guild_config(guild_config)
 
         # Try to send a message to the user who invited the bot by looking at the audit logs.
         if guild.me.guild_permissions.view_audit_log:
@@ -509,25 +526,71 @@ class Guilds(commands.Cog):
             except discord.Forbidden:
                 pass
 
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        """Route the clicks on the setup components to their handlers."""
+        if interaction.type is not discord.InteractionType.component or interaction.data is None:
+            return
+        parsed = SetupState.from_custom_id(interaction.data.get("custom_id", ""))  # type: ignore
+        if parsed is None:
+            return
+        action, state = parsed
+        # The custom_id can be sent without the setup message, so the permission of /setup is checked again
+        if interaction.guild is None or not interaction.permissions.manage_guild:
+            _ = get_bot_from_interaction(interaction).l10n.get_localization(interaction.locale).format
+            return await interaction.response.send_message(_("setup_not_allowed"), ephemeral=True)
+        handler = _setup_actions.get(action)
+        if handler is None:
+            logger.warning(f"Unknown setup action {action}")
+            return
+        await self.auto_defer.run(action, interaction, handler, state)
+
     @commands.Cog.listener()
     async def on_guild_remove(self, guild: discord.Guild):
         logger.info(f"Bot left guild {guild.name} ({guild.id})")
+        self.bot.settings.remove(guild.id)
+        await models.GuildConfig.mark_departed(self.bot.pool, guild.id)
 
-    @app_commands.command(name="setup")
-    @app_commands.guilds(296214474791190529)  # For testing purposes only
+    @app_commands.command(name="setup", description="Set up the bot in this server")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_guild=True)
     async def setup_command(self, interaction: discord.Interaction) -> None:
+        await self.auto_defer.run("setup_command", interaction, self._start_setup)
+
+    @staticmethod
+    async def _start_setup(interaction: discord.Interaction) -> None:
         bot = get_bot_from_interaction(interaction)
-        _ = bot.l10n.get_localization(interaction.locale).format
         guild = await models.GuildConfig.get(bot.pool, interaction.guild_id)  # type: ignore
         if guild and guild.setup_complete:
-            view = SetupAlreadyDone(last_interaction=interaction)
-            embed = view.embed(bot.l10n, interaction.locale)
-            return await interaction.response.send_message(embed=embed, view=view)
+            return await SetupAlreadyDone(interaction).send(interaction)
 
-        view = SetupIntroView(last_interaction=interaction)
-        embed = view.embed(self.bot.l10n, interaction.locale)
+        await SetupIntroView(interaction).send(interaction)
 
-        await interaction.response.send_message(embed=embed, view=view)
+    @app_commands.command(name="stats", description="Show how many members joined and were flagged recently")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_guild=True)
+    async def stats_command(self, interaction: discord.Interaction) -> None:
+        bot = get_bot_from_interaction(interaction)
+        _ = bot.l10n.get_localization(interaction.locale).format
+        stats = await bot.join_stats.get_stats(interaction.guild_id)  # type: ignore
+        embed = (
+            discord.Embed(title=_("join_stats_embed.title"), color=discord.Color.blurple())
+            .add_field(
+                name=_("join_stats_embed.last_hour"),
+                value=_(
+                    "join_stats_embed.value",
+                    {"joins": stats.joins_last_hour, "flagged": stats.flagged_last_hour},
+                ),
+            )
+            .add_field(
+                name=_("join_stats_embed.last_day"),
+                value=_(
+                    "join_stats_embed.value",
+                    {"joins": stats.joins_last_day, "flagged": stats.flagged_last_day},
+                ),
+            )
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 async def setup(bot: "GatekeeperBot"):
@@ -1,9 +1,24 @@
+import asyncio
+from dataclasses import dataclass, field
+
 import discord
-from discord.ext import commands
+import numpy as np
+from discord.ext import commands, tasks
 from loguru import logger
 from helpers import utils
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 from core import models
+from core.checks import CheckPlan, make_check
+from core.dashboard import RaidDashboard
+from core.hopping import JoinHoppingTracker
+from core.journal import JoinEvent
+from core.outbox import OutboxMessage
+from core.scheduler import FairScheduler
+from core.scoring import FLAG_SCORE, SIGNAL_WEIGHTS, BatchScorer
+from core.settings import JoinGuardConfigView
+from core.sketches import AvatarFrequencyTracker
+from core.similarity import UsernameSimilarity
+from core.verification import VERIFICATION_DM
 
 if TYPE_CHECKING:
     from main import GatekeeperBot
@@ -13,42 +28,315 @@ def created_join_delta(member: discord.Member) -> float:
     # There are some edge cases where discord doesn't send the joined_at
     if member.joined_at is None:
         return 0
-    return (member.created_at - member.joined_at).total_seconds()
+    return (member.joined_at - member.created_at).total_seconds()
+
+
+# How many recent joiners with a similar name make a member suspicious
+SIMILAR_NAMES_THRESHOLD = 3
+# How many other guilds joined or left in the hopping window make a member suspicious
+GUILDS_HOPPED_THRESHOLD = 2
+# How long the joiners that overflow the backlog of a guild are collected before being scored together
+OVERFLOW_BATCH_DELAY = 1.0
+
+
+@dataclass
+class JoinCheckResult:
+    """The outcome of checking a joining member.
+
+    Signals are 1.0 when suspicious and 0.0 otherwise. Checks disabled by the config,
+    or skipped because the verdict was already decided, are left out. Members that
+    already passed a verification in the guild are allowed whatever their score.
+    """
+
+    account_age: float
+    signals: dict[str, float] = field(default_factory=dict)
+    verified: bool = False
+
+    @property
+    def score(self) -> float:
+        return sum(SIGNAL_WEIGHTS.get(name, 1.0) * value for name, value in self.signals.items())
+
+    @property
+    def action(self) -> str:
+        return "flagged" if self.score >= FLAG_SCORE and not self.verified else "allowed"
 
 
 class JoinGuard(commands.Cog):
     def __init__(self, bot: "GatekeeperBot") -> None:
         self.bot = bot
+        self.recent_names = UsernameSimilarity(window=600)
+        # Shared by every guild, raiders usually join more than one
+        self.avatars = AvatarFrequencyTracker()
+        self.plans: dict[int, CheckPlan] = {}
+        # Shared by every guild too, self-bots join and leave many guilds in a few minutes
+        self.hops = JoinHoppingTracker(window=600)
+        # A raided guild can only use a couple of the workers, the others keep serving the other guilds
+        self.scheduler: FairScheduler[discord.Member] = FairScheduler(
+            self.handle_join,
+            workers=16,
+            per_guild_concurrency=4,
+            max_backlog=500,
+            on_overflow=self._on_overflow,
+            name="join_scheduler",
+        )
+        # One live status message per raided guild instead of a log line per join
+        self.dashboard = RaidDashboard(bot, self.scheduler.pending)
+        self._overflow: dict[int, list[discord.Member]] = {}
+        self._overflow_tasks: set[asyncio.Task] = set()
+
+    async def cog_load(self) -> None:
+        self.prune_recent_names.start()
+        self.scheduler.start()
+        self.dashboard.start()
+
+    async def cog_unload(self) -> None:
+        self.prune_recent_names.cancel()
+        await self.scheduler.close()
+        await self.dashboard.close()
+        for task in self._overflow_tasks:
+            task.cancel()
+
+    @tasks.loop(minutes=10)
+    async def prune_recent_names(self):
+        self.recent_names.prune()
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         if member.bot:
             return
 
+        # Recorded for every guild, even the ones without the join guard enabled
+        self.hops.record(member.id, member.guild.id)
+        config = self.bot.settings.join_guard_config(member.guild.id)
+        if config is not None:
+            maybe_enabled = config.is_enabled
+        else:
+            maybe_enabled = not self.bot.settings.join_guard_config_missing(member.guild.id)
+        if not maybe_enabled:
+            # Nothing to check, no need to wait in the queue of the guild
+            self.bot.join_stats.record(member.guild.id, at=member.joined_at)
+            return
+        self.scheduler.submit(member.guild.id, member)
+        self.dashboard.joined(member.guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        if not member.bot:
+            self.hops.record(member.id, member.guild.id)
+
+    async def handle_join(self, member: discord.Member):
+        """Check a joining member and act on the verdict. Run by the scheduler, a few members of a guild at once."""
         logger.debug(f"Member {member} joined guild {member.guild}")
 
-        config = await models.JoinGuardConfig.get(self.bot.pool, member.guild.id)
+        config = await self.get_config(member.guild.id)
         if config is None or not config.is_enabled:
+            self.bot.join_stats.record(member.guild.id, at=member.joined_at)
+            return
+        result = await self._check_joining_member(member, config)
+        await self._mark_verified(member.guild.id, [(member, result)])
+        await self._record_verdict(
+            member,
+            JoinEvent(
+                guild_id=member.guild.id,
+                user_id=member.id,
+                joined_at=member.joined_at or discord.utils.utcnow(),
+                account_age=result.account_age,
+                signals=result.signals,
+                score=result.score,
+                action=result.action,
+            ),
+        )
+
+    async def _mark_verified(self, guild_id: int, results: list[tuple[discord.Member, JoinCheckResult]]) -> None:
+        """Let through the flagged members that already passed a verification in the guild."""
+        flagged = [member.id for member, result in results if result.action == "flagged"]
+        if not flagged:
             return
-        await self._check_joining_member(member, config)
+        verified = await models.VerificationResult.verified_users(self.bot.pool, guild_id, flagged)
+        for member, result in results:
+            result.verified = member.id in verified
 
-    async def _check_joining_member(self, member: discord.Member, config: models.JoinGuardConfig):
-        if member.is_on_mobile() and config.mobile:
-            pass
+    async def _record_verdict(self, member: discord.Member, event: JoinEvent) -> None:
+        self.bot.join_stats.record(member.guild.id, flagged=event.action == "flagged", at=member.joined_at)
+        self.dashboard.checked(member.guild.id, flagged=event.action != "allowed")
+        if event.action == "flagged" and self.bot.outbox.has_handler(VERIFICATION_DM):
+            # Written with the verdict, so the DM is still sent if the bot restarts before sending it
+            message = OutboxMessage(VERIFICATION_DM, guild_id=member.guild.id, user_id=member.id)
+            await self.bot.outbox.record_verdict(event, [message])
+        else:
+            self.bot.join_journal.record(event)
+
+    def _on_overflow(self, guild_id: int, member: discord.Member) -> None:
+        # The joiners that don't fit in the backlog of a raided guild are scored in bulk instead
+        batch = self._overflow.setdefault(guild_id, [])
+        batch.append(member)
+        if len(batch) == 1:
+            task = asyncio.create_task(self._score_overflow(guild_id), name=f"joinguard-overflow-{guild_id}")
+            self._overflow_tasks.add(task)
+            task.add_done_callback(self._overflow_tasks.discard)
+
+    async def _score_overflow(self, guild_id: int) -> None:
+        await asyncio.sleep(OVERFLOW_BATCH_DELAY)
+        members = self._overflow.pop(guild_id, [])
+        if not members:
+            return
+        config = await self.get_config(guild_id)
+        if config is None or not config.is_enabled:
+            # Same as handle_join, the guard may have been disabled during the raid
+            for member in members:
+                self.bot.join_stats.record(guild_id, at=member.joined_at)
+            return
 
-        if created_join_delta(member) < config.join_delta_threshold and config.join_delta:
-            pass
+        batch_signals = self.signal_members(members, config)
+        logger.warning(f"Scored {len(members)} overflowing joiners of guild {guild_id} in bulk")
+        results = []
+        for index, member in enumerate(members):
+            result = JoinCheckResult(
+                account_age=created_join_delta(member),
+                signals={name: float(values[index]) for name, values in batch_signals.items()},
+            )
+            # The trackers are cheap and have to keep learning during a raid
+            result.signals.update(self._tracker_signals(member))
+            results.append((member, result))
+
+        await self._mark_verified(guild_id, results)
+        for member, result in results:
+            await self._record_verdict(
+                member,
+                JoinEvent(
+                    guild_id=guild_id,
+                    user_id=member.id,
+                    joined_at=member.joined_at or discord.utils.utcnow(),
+                    account_age=result.account_age,
+                    signals=result.signals,
+                    score=result.score,
+                    action=result.action,
+                ),
+            )
+
+    async def get_config(self, guild_id: int) -> JoinGuardConfigView | None:
+        """Get the join guard config of a guild from the settings table, loading it from the database if needed.
+
+        Args:
+            guild_id (int): The guild ID to search for.
+
+        Returns:
+            JoinGuardConfigView | None: The join guard config or None if the guild doesn't have one.
+        """
+        config = self.bot.settings.join_guard_config(guild_id)
+        if config is not None or self.bot.settings.join_guard_config_missing(guild_id):
+            return config
+
+        record = await models.JoinGuardConfig.get(self.bot.pool, guild_id)
+        if record is None:
+            # Most guilds never configure the join guard, don't query again on their next join
+            self.bot.settings.put_missing_join_guard_config(guild_id)
+            return None
+        return self.bot.settings.put_join_guard_config(record)
+
+    async def update_config(self, guild_id: int, **values: Any) -> JoinGuardConfigView:
+        """Update the join guard config of a guild in the database and the settings table.
+        The config is created with the defaults for the other columns if the guild doesn't have one.
+
+        Args:
+            guild_id (int): The guild ID of the config to update.
+            **values: The new value of each column to update.
+
+        Returns:
+            JoinGuardConfigView: The updated join guard config.
+        """
+        record = await models.JoinGuardConfig.update(self.bot.pool, guild_id, **values)
+        if record is None:
+            record = models.JoinGuardConfig(guild_id=guild_id, **values)
+            await record.save(self.bot.pool)
+        return self.bot.settings.put_join_guard_config(record)
+
+    def signal_members(self, members: list[discord.Member], config: JoinGuardConfigView) -> dict[str, np.ndarray]:
+        """Compute the signals of a batch of joining members at once, e.g. while a guild is being raided.
+        Only the signals that can be computed from the member IDs and join times are used.
+
+        Args:
+            members (list[discord.Member]): The members to check.
+            config (JoinGuardConfigView): The join guard config of the guild.
+
+        Returns:
+            dict[str, np.ndarray]: For each signal, if each member is suspicious, in the same order.
+        """
+        now = discord.utils.utcnow().timestamp()
+        user_ids = np.fromiter((member.id for member in members), dtype=np.uint64, count=len(members))
+        joined_at = np.fromiter(
+            ((member.joined_at.timestamp() if member.joined_at else now) for member in members),
+            dtype=np.float64,
+            count=len(members),
+        )
+        signals = BatchScorer(join_delta_threshold=config.join_delta_threshold).signals(user_ids, joined_at, now)
+        if not config.join_delta:
+            del signals["young_account"]
+        return signals
+
+    def get_plan(self, guild_id: int, config: JoinGuardConfigView) -> CheckPlan:
+        """Get the check plan of a guild, compiling it again if the config changed.
+
+        Args:
+            guild_id (int): The guild ID.
+            config (JoinGuardConfigView): The current join guard config of the guild.
+
+        Returns:
+            CheckPlan: The check plan.
+        """
+        key = (config.mobile, config.join_delta, config.join_delta_threshold, config.nitro, config.dm_locked)
+        plan = self.plans.get(guild_id)
+        if plan is None or plan.key != key:
+            plan = self.plans[guild_id] = self._compile_plan(key)
+        return plan
+
+    def _compile_plan(self, key: tuple) -> CheckPlan:
+        mobile, join_delta, join_delta_threshold, nitro, dm_locked = key
+        checks = []
+        if mobile:
+            checks.append(make_check("not_mobile", lambda member: not member.is_on_mobile()))
+        if join_delta:
+            checks.append(
+                make_check("young_account", lambda member: created_join_delta(member) < join_delta_threshold)
+            )
 
         # To check if the user is nitro require a api call,
         # so we only do it if the config is enabled to save api calls
-        if config.nitro:
-            if await utils.guess_if_user_is_nitro(self.bot, member):
-                pass
+        if nitro:
+
+            async def not_nitro(member: discord.Member) -> bool:
+                return not await utils.guess_if_user_is_nitro(self.bot, member)
+
+            checks.append(make_check("not_nitro", not_nitro))
 
         # Again to save on rate limits
-        if config.dm_locked:
-            if await utils.is_dm_open(member):
-                pass
+        if dm_locked:
+
+            async def dm_closed(member: discord.Member) -> bool:
+                return not await utils.is_dm_open(member)
+
+            checks.append(make_check("dm_closed", dm_closed))
+        return CheckPlan(key, checks)
+
+    def _tracker_signals(self, member: discord.Member) -> dict[str, float]:
+        """Add a joining member to the trackers shared by every guild and get their signals."""
+        similar_names = self.recent_names.add(member.guild.id, member.name)
+        avatar_key = member.avatar.key if member.avatar else None
+        guilds_hopped = self.hops.guilds_hopped(member.id, exclude=member.guild.id)
+        return {
+            "similar_names": float(similar_names >= SIMILAR_NAMES_THRESHOLD),
+            "duplicate_avatar": float(self.avatars.observe(avatar_key)),
+            "guild_hopping": float(guilds_hopped >= GUILDS_HOPPED_THRESHOLD),
+        }
+
+    async def _check_joining_member(self, member: discord.Member, config: JoinGuardConfigView) -> JoinCheckResult:
+        result = JoinCheckResult(account_age=created_join_delta(member))
+        # These always run, every joiner has to be added to the trackers
+        result.signals.update(self._tracker_signals(member))
+
+        plan = self.get_plan(member.guild.id, config)
+        await plan.run(member, result.signals, result.score)
+        return result
 
 
 async def setup(bot: "GatekeeperBot"):
@@ -0,0 +1,213 @@
+from typing import TYPE_CHECKING
+
+import discord
+from core import models
+from core.outbox import OutboxMessage
+from core.verification import (
+    VERIFICATION_DM,
+    InvalidVerificationToken,
+    VerificationClaims,
+    VerificationServer,
+    VerificationTokens,
+)
+from discord.ext import commands
+from helpers.utils import get_bot_from_interaction
+from loguru import logger
+
+if TYPE_CHECKING:
+    from main import GatekeeperBot
+
+
+def _get_token_from_message(message: discord.Message | None) -> str | None:
+    """Get the token from the URL of the link button of a verification message."""
+    if message is None:
+        return None
+    for row in message.components:
+        for component in getattr(row, "children", []):
+            if isinstance(component, discord.components.Button) and component.url:
+                return component.url.rstrip("/").rpartition("/")[2]
+    return None
+
+
+class VerificationView(discord.ui.View):
+    """The buttons of a verification message.
+
+    Registered once as a persistent view, the token is read from the link button of the
+    message that was clicked, so no state is kept for the messages that were sent.
+    """
+
+    def __init__(self, *, url: str | None = None, _=None):
+        super().__init__(timeout=None)
+        if _ is not None:
+            self.confirm_button.label = _("verification_dm.confirm_button")
+        if url is not None:
+            self.add_item(discord.ui.Button(label=_("verification_dm.link_button") if _ else None, url=url))
+
+    @discord.ui.button(
+        label="verification_dm.confirm_button", style=discord.ButtonStyle.green, custom_id="verification:confirm"
+    )
+    async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        bot = get_bot_from_interaction(interaction)
+        cog: Verification | None = bot.get_cog("Verification")  # type: ignore
+        if cog is not None:
+            await cog.confirm(interaction)
+
+
+class VerificationModal(discord.ui.Modal):
+    """Asks the challenge of a verification token, opened by the confirm button of a verification message."""
+
+    def __init__(self, cog: "Verification", claims: VerificationClaims, _) -> None:
+        super().__init__(title=_("verification_dm.modal_title"))
+        self.cog = cog
+        self.claims = claims
+        a, b = cog.tokens.question(claims)  # type: ignore
+        self.answer = discord.ui.TextInput(label=_("verification_dm.question", {"a": a, "b": b}), max_length=4)
+        self.add_item(self.answer)
+
+    async def on_submit(self, interaction: discord.Interaction) -> None:
+        await self.cog.answer(interaction, self.claims, self.answer.value)
+
+
+class Verification(commands.Cog):
+    def __init__(self, bot: "GatekeeperBot"):
+        self.bot = bot
+        self.config = bot.config.verification
+        self.tokens = VerificationTokens(self.config.secret, self.config.token_ttl) if self.config.secret else None
+        self.server: VerificationServer | None = None
+
+    async def cog_load(self) -> None:
+        if self.tokens is None:
+            logger.info("Verification is disabled because VERIFICATION_SECRET is not set.")
+            return
+        self.bot.add_view(VerificationView())
+        self.bot.outbox.handler(VERIFICATION_DM)(self._send_queued_verification)
+        self.server = VerificationServer(self.tokens, self.complete, self.config.host, self.config.port)
+        await self.server.start()
+
+    async def cog_unload(self) -> None:
+        self.bot.outbox.remove_handler(VERIFICATION_DM)
+        if self.server is not None:
+            await self.server.close()
+
+    def _get_invite_code(self, guild: discord.Guild) -> str | None:
+        guild_config = self.bot.settings.guild_config(guild.id)
+        if guild_config is None:
+            return None
+        if guild_config.use_vanity_invite:
+            return guild.vanity_url_code
+        return guild_config.custom_invite_code
+
+    async def send_verification(self, member: discord.Member) -> bool:
+        """Send a verification message to a member.
+
+        Args:
+            member (discord.Member): The member that has to verify.
+
+        Returns:
+            bool: True if the message was sent, False otherwise.
+        """
+        try:
+            return await self._send_verification(member)
+        except discord.HTTPException:
+            return False
+
+    async def _send_verification(self, member: discord.Member) -> bool:
+        """Send a verification message to a member, raising the errors that are worth a retry.
+
+        Args:
+            member (discord.Member): The member that has to verify.
+
+        Returns:
+            bool: True if the message was sent, False if the member doesn't accept DMs.
+
+        Raises:
+            discord.HTTPException: If sending failed for another reason, e.g. a rate limit or a server error.
+        """
+        if self.tokens is None:
+            return False
+
+        token = self.tokens.issue(member.guild.id, member.id, self._get_invite_code(member.guild))
+        guild_config = self.bot.settings.guild_config(member.guild.id)
+        locale = guild_config.locale if guild_config and guild_config.locale else member.guild.preferred_locale
+        _ = self.bot.l10n.get_localization(locale).format
+
+        embed = discord.Embed(
+            title=_("verification_dm.title"),
+            description=_("verification_dm.description", {"guild": member.guild.name}),
+            color=discord.Color.yellow(),
+        )
+        view = VerificationView(url=f"{self.config.base_url.rstrip('/')}/verify/{token}", _=_)
+        try:
+            await member.send(embed=embed, view=view)
+        except discord.Forbidden:
+            return False
+        finally:
+            # The clicks are handled by the persistent view, so don't keep this one in memory
+            view.stop()
+        return True
+
+    async def _send_queued_verification(self, message: OutboxMessage) -> None:
+        guild = self.bot.get_guild(message.guild_id)
+        if guild is None:
+            return
+        member = guild.get_member(message.user_id)  # type: ignore
+        if member is None:
+            try:
+                member = await guild.fetch_member(message.user_id)  # type: ignore
+            except discord.NotFound:
+                # Left the guild before the message was sent
+                return
+        # The other errors are raised, so the outbox retries the message with a backoff
+        await self._send_verification(member)
+
+    async def complete(self, claims: VerificationClaims) -> bool:
+        """Persist a successful verification. The join guard doesn't flag the user in the guild anymore.
+
+        Args:
+            claims (VerificationClaims): The claims of the verified token.
+
+        Returns:
+            bool: True if it is the first time this challenge was completed, False otherwise.
+        """
+        result = models.VerificationResult(
+            guild_id=claims.guild_id,
+            user_id=claims.user_id,
+            challenge=claims.challenge,
+            outcome="verified",
+        )
+        saved = await result.save(self.bot.pool)
+        if saved:
+            logger.info(f"User {claims.user_id} verified for guild {claims.guild_id}")
+        return saved
+
+    async def confirm(self, interaction: discord.Interaction) -> None:
+        """Ask the challenge of a verification message when its confirm button is clicked."""
+        _ = self.bot.l10n.get_localization(interaction.locale).format
+        token = _get_token_from_message(interaction.message)
+        try:
+            if self.tokens is None or token is None:
+                raise InvalidVerificationToken("No token")
+            claims = self.tokens.verify(token)
+        except InvalidVerificationToken:
+            return await interaction.response.send_message(_("verification_dm.invalid"))
+
+        if claims.user_id != interaction.user.id:
+            return await interaction.response.send_message(_("verification_dm.invalid"))
+
+        await interaction.response.send_modal(VerificationModal(self, claims, _))
+
+    async def answer(self, interaction: discord.Interaction, claims: VerificationClaims, answer: str) -> None:
+        """Complete a verification if the answer to its challenge is correct."""
+        _ = self.bot.l10n.get_localization(interaction.locale).format
+        if self.tokens is None or not self.tokens.check_answer(claims, answer):
+            return await interaction.response.send_message(_("verification_dm.wrong_answer"))
+
+        await self.complete(claims)
+        invite_url = f"https://discord.gg/{claims.invite_code}" if claims.invite_code else ""
+        await interaction.response.edit_message(
+            content=_("verification_dm.verified", {"invite": invite_url}), embed=None, view=None
+        )
+
+
+async def setup(bot: "GatekeeperBot"):
+    await bot.add_cog(Verification(bot))
@@ -0,0 +1,78 @@
+import datetime
+
+import discord
+from loguru import logger
+
+
+class RecentMembersCachePolicy:
+    """A member cache policy that only keeps the members that joined recently.
+
+    The join guard only cares about members that just joined, so every other
+    member is periodically evicted from the cache. The bot member is always kept.
+    """
+
+    def __init__(self, hours: int) -> None:
+        """Initializes the cache policy
+
+        Args:
+            hours (int): For how many hours after joining a member is kept in the cache.
+        """
+        self.max_age = datetime.timedelta(hours=hours)
+
+    @staticmethod
+    def member_cache_flags() -> discord.MemberCacheFlags:
+        """Get the member cache flags that should be used with this policy.
+
+        Members are only cached when they join or are updated, never because
+        they are in a voice channel, so they can be evicted by `prune`.
+
+        Returns:
+            discord.MemberCacheFlags: The member cache flags.
+        """
+        return discord.MemberCacheFlags(joined=True, voice=False)
+
+    def should_keep(self, member: discord.Member, cutoff: datetime.datetime) -> bool:
+        """Check if a member should be kept in the cache.
+
+        Args:
+            member (discord.Member): The member to check.
+            cutoff (datetime.datetime): Members that joined before this are evicted.
+
+        Returns:
+            bool: True if the member should be kept, False otherwise.
+        """
+        if member.id == member._state.self_id:
+            return True
+        # There are some edge cases where discord doesn't send the joined_at
+        return member.joined_at is not None and member.joined_at >= cutoff
+
+    def prune_guild(self, guild: discord.Guild, now: datetime.datetime | None = None) -> int:
+        """Remove the members that should not be kept from the cache of a guild.
+
+        Args:
+            guild (discord.Guild): The guild to prune.
+            now (datetime.datetime | None, optional): The current time. Defaults to utcnow.
+
+        Returns:
+            int: How many members were removed.
+        """
+        cutoff = (now or discord.utils.utcnow()) - self.max_age
+        stale_members = [member for member in guild.members if not self.should_keep(member, cutoff)]
+        for member in stale_members:
+            guild._remove_member(member)
+        return len(stale_members)
+
+    def prune(self, guilds: list[discord.Guild]) -> int:
+        """Remove the members that should not be kept from the cache of every guild.
+
+        Args:
+            guilds (list[discord.Guild]): The guilds to prune.
+
+        Returns:
+            int: How many members were removed in total.
+        """
+        now = discord.utils.utcnow()
+        removed = sum(self.prune_guild(guild, now) for guild in guilds)
+        if removed:
+            logger.debug(f"Evicted {removed} members from the member cache")
+        return removed
@@ -0,0 +1,69 @@
+import hashlib
+import json
+
+import asyncpg
+import discord
+from discord import app_commands
+from loguru import logger
+
+GLOBAL_SCOPE = 0
+
+
+class CommandSyncManager:
+    """Sync the app commands only when they changed since the last sync.
+
+    The translated payload that `tree.sync` would send is hashed and compared with the
+    hash stored at the last sync, so a deploy that doesn't touch the commands or their
+    translations doesn't pay for a slow and rate limited sync.
+    """
+
+    def __init__(self, tree: app_commands.CommandTree, pool: asyncpg.Pool) -> None:
+        self.tree = tree
+        self.pool = pool
+
+    async def payload_hash(self, guild: discord.abc.Snowflake | None = None) -> str:
+        """Hash the payload of the commands as it would be sent by `tree.sync`.
+
+        Args:
+            guild (discord.abc.Snowflake | None, optional): The guild of the commands. Defaults to the global ones.
+
+        Returns:
+            str: The hex digest of the payload.
+        """
+        commands = self.tree.get_commands(guild=guild)
+        translator = self.tree.translator
+        if translator is not None:
+            payload = [await command.get_translated_payload(translator) for command in commands]
+        else:
+            payload = [command.to_dict() for command in commands]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    async def sync(self, guild: discord.abc.Snowflake | None = None, *, force: bool = False) -> bool:
+        """Sync the commands if their payload changed since the last sync.
+
+        Args:
+            guild (discord.abc.Snowflake | None, optional): The guild to sync. Defaults to the global commands.
+            force (bool, optional): Sync even if the payload did not change. Defaults to False.
+
+        Returns:
+            bool: If the commands were synced.
+        """
+        scope = GLOBAL_SCOPE if guild is None else guild.id
+        payload_hash = await self.payload_hash(guild)
+        stored_hash = await self.pool.fetchval("SELECT payload_hash FROM app_command_syncs WHERE scope = $1", scope)
+        if not force and stored_hash == payload_hash:
+            logger.info(f"The app commands of scope {scope} did not change, skipping the sync")
+            return False
+
+        synced = await self.tree.sync(guild=guild)
+        # Only stored after a successful sync, so a failed one is retried on the next start
+        await self.pool.execute(
+            """
+            INSERT INTO app_command_syncs (scope, payload_hash) VALUES ($1, $2)
+            ON CONFLICT (scope) DO UPDATE SET payload_hash = $2, synced_at = now()
+            """,
+            scope,
+            payload_hash,
+        )
+        logger.info(f"Synced {len(synced)} app commands of scope {scope}")
+        return True
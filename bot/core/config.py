@@ -3,14 +3,28 @@ from dataclasses import dataclass, field
 
 _initial_cogs = [
     "cogs.guilds",
+    "cogs.joinguard",
+    "cogs.diagnostics",
+    "cogs.verification",
 ]
 
 
+def _optional_int_env(name: str) -> int | None:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
 @dataclass(frozen=True)
 class BotConfig:
     token: str = os.environ["DISCORD_TOKEN"]
     prefix: str = os.environ["DISCORD_PREFIX"]
     initial_cogs: list[str] = field(default_factory=lambda: _initial_cogs)
+    # Only keep members that joined in the last N hours in the cache, unset to cache every member
+    member_cache_hours: int | None = _optional_int_env("MEMBER_CACHE_HOURS")
+    # How long the data of a guild is kept after the bot leaves it, in case it is added back
+    departed_guild_retention_days: int = int(os.environ.get("DEPARTED_GUILD_RETENTION_DAYS", 30))
+    # "performance" uses uvloop, orjson and a tuned HTTP connector when they are installed
+    runtime_profile: str = os.environ.get("RUNTIME_PROFILE", "default")
 
 
 @dataclass(frozen=True)
@@ -18,12 +32,24 @@ class DbConfig:
     dsn = os.environ["POSTGRES_DSN"]
 
 
+@dataclass(frozen=True)
+class VerificationConfig:
+    # The verification is disabled while there is no secret to sign the tokens with
+    secret: str | None = os.environ.get("VERIFICATION_SECRET")
+    token_ttl: int = int(os.environ.get("VERIFICATION_TOKEN_TTL", 3600))
+    host: str = os.environ.get("VERIFICATION_HOST", "127.0.0.1")
+    port: int = int(os.environ.get("VERIFICATION_PORT", 8080))
+    # The public URL where the verification endpoint can be reached
+    base_url: str = os.environ.get("VERIFICATION_BASE_URL", "http://localhost:8080")
+
+
 @dataclass(frozen=True)
 class Config:
     """Dataclass that holds all the config for the bot."""
 
     bot: BotConfig = BotConfig()
     db: DbConfig = DbConfig()
+    verification: VerificationConfig = VerificationConfig()
 
 
 config = Config()
@@ -0,0 +1,181 @@
+import asyncio
+import datetime
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
+
+import discord
+from core.metrics import metrics
+from helpers.utils import ProgressBar
+from loguru import logger
+
+if TYPE_CHECKING:
+    from main import GatekeeperBot
+
+
+@dataclass
+class RaidStatus:
+    """The counters of a raid and the message that shows them."""
+
+    channel_id: int
+    locale: str
+    started_at: datetime.datetime
+    joins: int = 0
+    checked: int = 0
+    flagged: int = 0
+    last_join: float = field(default_factory=time.monotonic)
+    message: discord.Message | None = None
+    # The embed of the last edit, to skip the edits that would not change anything
+    rendered: dict | None = None
+    # Set when the message can't be sent, the counters are still kept
+    disabled: bool = False
+
+
+class RaidDashboard:
+    """Keep a single live status message per raided guild, in its entry log channel.
+
+    A raid starts when the join backlog of a guild reaches `start_backlog` and ends once
+    the guild had no join for `quiet_period` seconds and its backlog is empty. The joins
+    and verdicts only update counters in memory; a background task renders them every
+    `interval` seconds and edits the message only if the embed changed, so a raid costs
+    at most one edit per guild per interval, well below the rate limit of the route.
+    """
+
+    def __init__(
+        self,
+        bot: "GatekeeperBot",
+        pending: Callable[[int], int],
+        *,
+        interval: float = 5.0,
+        start_backlog: int = 20,
+        quiet_period: float = 60.0,
+        bar_length: int = 20,
+    ) -> None:
+        self.bot = bot
+        self.pending = pending
+        self.interval = interval
+        self.start_backlog = start_backlog
+        self.quiet_period = quiet_period
+        self.bar_length = bar_length
+
+        self.raids: dict[int, RaidStatus] = {}
+        self._task: asyncio.Task | None = None
+        self._edits = metrics.counter("raid_dashboard_edits", "Raid dashboard messages sent or edited.")
+        self._skipped = metrics.counter("raid_dashboard_skipped", "Raid dashboard edits skipped as nothing changed.")
+
+    def start(self) -> None:
+        """Start refreshing the messages."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="raid-dashboard")
+
+    async def close(self) -> None:
+        """Stop refreshing the messages. The raids in progress are forgotten."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.raids.clear()
+
+    def joined(self, guild_id: int) -> None:
+        """Count a join of a guild, starting a raid if its backlog is large enough."""
+        status = self.raids.get(guild_id)
+        if status is not None:
+            status.joins += 1
+            status.last_join = time.monotonic()
+            return
+
+        backlog = self.pending(guild_id)
+        if backlog < self.start_backlog:
+            return
+        guild_config = self.bot.settings.guild_config(guild_id)
+        if guild_config is None or not guild_config.entry_log_channel_id:
+            return
+        if guild_config.locale:
+            locale = guild_config.locale
+        else:
+            guild = self.bot.get_guild(guild_id)
+            locale = str(guild.preferred_locale) if guild is not None else "en-US"
+        self.raids[guild_id] = RaidStatus(
+            channel_id=guild_config.entry_log_channel_id,
+            locale=locale,
+            started_at=discord.utils.utcnow(),
+            # The joins already waiting are part of the raid
+            joins=backlog,
+        )
+        logger.warning(f"Raid started in guild {guild_id} with {backlog} joins waiting")
+
+    def checked(self, guild_id: int, flagged: bool) -> None:
+        """Count a verdict of a guild, if it is being raided."""
+        status = self.raids.get(guild_id)
+        if status is not None:
+            status.checked += 1
+            status.flagged += flagged
+
+    def render(self, guild_id: int, status: RaidStatus, ended: bool) -> discord.Embed:
+        """Build the embed of a raid."""
+        _ = self.bot.l10n.get_localization(status.locale).format
+        bar = ProgressBar(max(status.joins, status.checked, 1), self.bar_length)
+        bar.next(status.checked)
+        started = discord.utils.format_dt(status.started_at, "R")
+        return (
+            discord.Embed(
+                title=_("raid_dashboard.title_ended" if ended else "raid_dashboard.title"),
+                description=f"{_('raid_dashboard.description', {'started': started})}\n"
+                f"{bar.bar} {bar.percentage:.0f}%",
+                color=discord.Color.green() if ended else discord.Color.red(),
+            )
+            .add_field(name=_("raid_dashboard.joins"), value=str(status.joins))
+            .add_field(name=_("raid_dashboard.checked"), value=str(status.checked))
+            .add_field(name=_("raid_dashboard.flagged"), value=str(status.flagged))
+            .add_field(name=_("raid_dashboard.queue"), value=str(self.pending(guild_id)))
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            # Each guild posts in its own channel, so the edits don't share a rate limit
+            results = await asyncio.gather(
+                *(self._refresh(guild_id, status, now) for guild_id, status in list(self.raids.items())),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.opt(exception=result).error("Error while refreshing a raid dashboard")
+
+    async def _refresh(self, guild_id: int, status: RaidStatus, now: float) -> None:
+        ended = now - status.last_join >= self.quiet_period and not self.pending(guild_id)
+        if ended:
+            self.raids.pop(guild_id, None)
+            logger.info(f"Raid ended in guild {guild_id}: {status.joins} joins, {status.flagged} flagged")
+        if status.disabled:
+            return
+
+        embed = self.render(guild_id, status, ended)
+        rendered = embed.to_dict()
+        if rendered == status.rendered:
+            self._skipped.inc()
+            return
+
+        try:
+            if status.message is None:
+                channel = self.bot.get_channel(status.channel_id)
+                if not isinstance(channel, discord.abc.Messageable):
+                    status.disabled = True
+                    return
+                status.message = await channel.send(embed=embed)
+            else:
+                status.message = await status.message.edit(embed=embed)
+        except discord.NotFound:
+            # Deleted, a new message is sent on the next refresh
+            status.message = None
+            return
+        except discord.Forbidden:
+            logger.warning(f"Cannot send the raid dashboard of guild {guild_id} in channel {status.channel_id}")
+            status.disabled = True
+            return
+        except discord.HTTPException:
+            logger.exception(f"Failed to update the raid dashboard of guild {guild_id}")
+            return
+        status.rendered = rendered
+        self._edits.inc()
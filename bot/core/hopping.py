@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+
+
+class JoinHoppingTracker:
+    """Remembers the guilds each user recently joined or left, across every guild of the bot.
+
+    Users are kept in the order of their last join or leave, so the expired ones are always
+    at the front and dropped in O(1) each, and the store never holds more than `max_users`
+    users with `max_events_per_user` events each: when full, the least recently active user
+    is dropped first.
+    """
+
+    def __init__(self, window: float = 600.0, max_users: int = 100_000, max_events_per_user: int = 16) -> None:
+        self.window = window
+        self.max_users = max_users
+        self.max_events_per_user = max_events_per_user
+        # user_id -> [(monotonic time, guild_id)], oldest first
+        self._users: OrderedDict[int, list[tuple[float, int]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.window
+        users = self._users
+        while users:
+            events = next(iter(users.values()))
+            if events[-1][0] >= cutoff and len(users) <= self.max_users:
+                break
+            users.popitem(last=False)
+
+    def record(self, user_id: int, guild_id: int, now: float | None = None) -> None:
+        """Record that a user joined or left a guild.
+
+        Args:
+            user_id (int): The user ID.
+            guild_id (int): The guild the user joined or left.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+        """
+        now = time.monotonic() if now is None else now
+        events = self._users.get(user_id)
+        if events is None:
+            events = self._users[user_id] = []
+        else:
+            self._users.move_to_end(user_id)
+        events.append((now, guild_id))
+        if len(events) > self.max_events_per_user:
+            del events[0]
+        self._evict(now)
+
+    def guilds_hopped(self, user_id: int, exclude: int | None = None, now: float | None = None) -> int:
+        """Count the distinct guilds a user joined or left in the window.
+
+        Args:
+            user_id (int): The user ID.
+            exclude (int | None, optional): A guild to leave out, usually the one being joined.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            int: How many guilds the user hopped through.
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        events = self._users.get(user_id)
+        if not events:
+            return 0
+        cutoff = now - self.window
+        return len({guild_id for at, guild_id in events if at >= cutoff and guild_id != exclude})
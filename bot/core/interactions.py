@@ -0,0 +1,143 @@
+import asyncio
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable
+
+import discord
+from core.metrics import metrics
+from loguru import logger
+
+# Discord drops the interactions that are not responded to within 3 seconds
+INTERACTION_DEADLINE = 3.0
+# Key of the lock in `Interaction.extras` that serializes the responses and the automatic defer
+RESPONSE_LOCK = "response_lock"
+# Key of the time the handler started responding in `Interaction.extras`
+RESPONDING_AT = "responding_at"
+# Key of how long the first response request of the handler took in `Interaction.extras`
+RESPONSE_SECONDS = "response_seconds"
+
+HANDLER_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0, 10.0)
+
+
+class AutoDefer:
+    """Defer the interactions whose handler would miss the deadline of Discord.
+
+    The time each handler takes before it starts responding, and the round trip of the
+    response requests, are tracked with exponential moving averages. Discord receives a
+    request half a round trip after it is sent, so that much is taken off the `budget`.
+    A handler projected to start responding after what is left of it is deferred right
+    away, and the others are deferred when it runs out if they still haven't responded.
+    Until a round trip was observed, every interaction is deferred right away.
+    The budget counts from the creation of the interaction and is kept below the 3 seconds
+    of Discord to leave room for jitter.
+
+    The handlers must respond with `edit_response` and `send_response`, which switch to
+    editing the original response or sending a followup once the interaction is deferred.
+    """
+
+    def __init__(self, budget: float = 2.0, smoothing: float = 0.2) -> None:
+        self.budget = budget
+        self.smoothing = smoothing
+        # handler name -> moving average of the seconds it takes before responding
+        self.projected: dict[str, float] = {}
+        # Moving average of the round trip of the response requests, shared by every handler
+        self.round_trip: float | None = None
+        self._duration = metrics.histogram(
+            "interaction_handler.seconds", "How long the interaction handlers took.", HANDLER_BUCKETS
+        )
+        self._deferred = metrics.counter("interaction_auto_deferred", "Interactions deferred automatically.")
+
+    def remaining(self, interaction: discord.Interaction) -> float:
+        """Get how many seconds are left to send a response that Discord receives within the budget."""
+        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        return self.budget - max(age, 0.0) - (self.round_trip or 0.0) / 2
+
+    def _observe_round_trip(self, elapsed: float) -> None:
+        previous = self.round_trip
+        self.round_trip = elapsed if previous is None else previous + self.smoothing * (elapsed - previous)
+
+    async def run(
+        self, name: str, interaction: discord.Interaction, handler: Callable[..., Awaitable[Any]], *args: Any
+    ) -> None:
+        """Run the handler of an interaction, deferring it if it gets close to the deadline.
+
+        Args:
+            name (str): The name of the handler, its time to respond is projected from its previous runs.
+            interaction (discord.Interaction): The interaction, passed to the handler.
+            handler (Callable[..., Awaitable[Any]]): The handler.
+            *args: The other arguments of the handler.
+        """
+        interaction.extras.setdefault(RESPONSE_LOCK, asyncio.Lock())
+        remaining = self.remaining(interaction)
+        timer = None
+        if self.round_trip is None or self.projected.get(name, 0.0) >= remaining:
+            await self._defer(name, interaction)
+        else:
+            timer = asyncio.create_task(self._defer_after(remaining, name, interaction))
+
+        start = time.perf_counter()
+        try:
+            await handler(interaction, *args)
+        finally:
+            end = time.perf_counter()
+            if timer is not None:
+                timer.cancel()
+            self._duration.observe(end - start)
+            if RESPONSE_SECONDS in interaction.extras:
+                self._observe_round_trip(interaction.extras[RESPONSE_SECONDS])
+            # The request of the response itself is not part of the projection, it is sent either way
+            elapsed = interaction.extras.get(RESPONDING_AT, end) - start
+            previous = self.projected.get(name)
+            self.projected[name] = elapsed if previous is None else previous + self.smoothing * (elapsed - previous)
+
+    async def _defer_after(self, delay: float, name: str, interaction: discord.Interaction) -> None:
+        await asyncio.sleep(delay)
+        await self._defer(name, interaction)
+
+    async def _defer(self, name: str, interaction: discord.Interaction) -> None:
+        async with interaction.extras[RESPONSE_LOCK]:
+            if interaction.response.is_done():
+                return
+            sent = time.perf_counter()
+            try:
+                await interaction.response.defer()
+            except discord.HTTPException:
+                logger.exception(f"Failed to defer the {name} interaction")
+                return
+            self._observe_round_trip(time.perf_counter() - sent)
+        self._deferred.inc()
+        logger.debug(f"Deferred the {name} interaction, projected to respond in {self.projected.get(name, 0.0):.2f}s")
+
+
+async def edit_response(interaction: discord.Interaction, **kwargs: Any) -> None:
+    """Edit the message of a component interaction, or its original response if it was deferred.
+
+    Args:
+        interaction (discord.Interaction): The interaction.
+        **kwargs: The arguments of `InteractionResponse.edit_message`, e.g. content, embed and view.
+    """
+    interaction.extras.setdefault(RESPONDING_AT, time.perf_counter())
+    async with interaction.extras.get(RESPONSE_LOCK) or nullcontext():
+        sent = time.perf_counter()
+        if interaction.response.is_done():
+            await interaction.edit_original_response(**kwargs)
+        else:
+            await interaction.response.edit_message(**kwargs)
+        interaction.extras.setdefault(RESPONSE_SECONDS, time.perf_counter() - sent)
+
+
+async def send_response(interaction: discord.Interaction, **kwargs: Any) -> None:
+    """Send the response of an interaction, or a followup if it was deferred.
+
+    Args:
+        interaction (discord.Interaction): The interaction.
+        **kwargs: The arguments of `InteractionResponse.send_message`, e.g. content, embed, view and ephemeral.
+    """
+    interaction.extras.setdefault(RESPONDING_AT, time.perf_counter())
+    async with interaction.extras.get(RESPONSE_LOCK) or nullcontext():
+        sent = time.perf_counter()
+        if interaction.response.is_done():
+            await interaction.followup.send(**kwargs)
+        else:
+            await interaction.response.send_message(**kwargs)
+        interaction.extras.setdefault(RESPONSE_SECONDS, time.perf_counter() - sent)
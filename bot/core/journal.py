@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import json
+from dataclasses import dataclass
+
+import asyncpg
+from core.metrics import metrics
+from loguru import logger
+
+JOIN_EVENTS_COLUMNS = ("guild_id", "user_id", "joined_at", "account_age", "signals", "score", "action")
+
+
+@dataclass
+class JoinEvent:
+    """A member that joined a guild and the outcome of the join guard checks."""
+
+    guild_id: int
+    user_id: int
+    joined_at: datetime.datetime
+    account_age: float
+    signals: dict[str, float]
+    score: float
+    action: str
+
+    def to_record(self) -> tuple:
+        return (
+            self.guild_id,
+            self.user_id,
+            self.joined_at,
+            self.account_age,
+            json.dumps(self.signals),
+            self.score,
+            self.action,
+        )
+
+
+class JoinEventJournal:
+    """A buffered writer for the `join_events` table.
+
+    Events are kept in memory and written in batches with COPY, either when
+    `batch_size` events are buffered or every `flush_interval` seconds, so recording
+    an event never waits on the database. When `max_buffered` events are already
+    waiting, new events are dropped and counted instead of growing the buffer.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_buffered: int = 10_000,
+    ) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+
+        self._buffer: list[JoinEvent] = []
+        self._flush_needed = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self._written = metrics.counter("join_events_written", "Join events written to the database.")
+        self._dropped = metrics.counter("join_events_dropped", "Join events dropped because the buffer was full.")
+
+    def record(self, event: JoinEvent) -> bool:
+        """Add an event to the buffer without waiting.
+
+        Args:
+            event (JoinEvent): The event to record.
+
+        Returns:
+            bool: True if the event was buffered, False if it was dropped.
+        """
+        if len(self._buffer) >= self.max_buffered:
+            self._dropped.inc()
+            return False
+
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_size:
+            self._flush_needed.set()
+        return True
+
+    def start(self) -> None:
+        """Start the background task that flushes the buffer."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="join-event-journal")
+
+    async def close(self) -> None:
+        """Stop the background task and flush what is left in the buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error while flushing the join events journal")
+
+    async def flush(self) -> int:
+        """Write every buffered event to the database.
+
+        Notes:
+            If the write fails, the events are put back in the buffer while there is room for them.
+
+        Returns:
+            int: How many events were written.
+        """
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                try:
+                    async with self.pool.acquire() as connection:
+                        await connection.copy_records_to_table(
+                            "join_events",
+                            records=[event.to_record() for event in batch],
+                            columns=JOIN_EVENTS_COLUMNS,
+                        )
+                except BaseException:
+                    # Also catches the cancellation on shutdown, so the batch is flushed again by close
+                    room = max(self.max_buffered - len(self._buffer), 0)
+                    self._buffer[:0] = batch[:room]
+                    self._dropped.inc(len(batch) - min(room, len(batch)))
+                    raise
+                written += len(batch)
+                self._written.inc(len(batch))
+            return written
@@ -71,6 +71,15 @@ class Localization:
         """
         self._localizations[locales[0]] = FluentLocalization(locales, self._file_names, self._loader)
 
+    def parse_all(self) -> None:
+        """Parse the resources of every loaded localization.
+        The resources are parsed lazily by default, which would make the first message formatted
+        for each locale pay for it.
+        """
+        for localization in self._localizations.values():
+            for _ in localization._bundles():
+                pass
+
     def get_localization(self, locale: str | discord.Locale) -> FluentLocalization:
         """Get a localization for a locale.
 
@@ -95,9 +104,59 @@ class Localization:
         self._default_locale = locale
 
 
+# The prefix of the Fluent messages holding the localized names and descriptions of the app commands
+COMMAND_MESSAGE_PREFIX = "command-"
+
+
+def _command_message_id(string: app_commands.locale_str, context: app_commands.TranslationContextTypes) -> str | None:
+    """Get the ID of the Fluent message attribute for a string of an app command.
+
+    Examples:
+        The description of `/setup` is `command-setup.description`, and the name of
+        the `channel` parameter of `/setup log` is `command-setup-log-channel.name`.
+        Any other string needs an explicit ID: `locale_str("Yes", id="choice-yes.name")`.
+    """
+    if "id" in string.extras:
+        return string.extras["id"]
+
+    location = context.location
+    locations = app_commands.TranslationContextLocation
+    if location in (locations.command_name, locations.group_name):
+        command, attribute = context.data.qualified_name, "name"
+    elif location in (locations.command_description, locations.group_description):
+        command, attribute = context.data.qualified_name, "description"
+    elif location in (locations.parameter_name, locations.parameter_description):
+        parameter = context.data
+        command = f"{parameter.command.qualified_name} {parameter.name}"
+        attribute = "name" if location is locations.parameter_name else "description"
+    else:
+        return None
+    return f"{COMMAND_MESSAGE_PREFIX}{command.replace(' ', '-')}.{attribute}"
+
+
 class Translator(app_commands.Translator):
+    """Serves the localized names and descriptions of the app commands from a table built once from the Fluent bundles."""
+
     def __init__(self, localization: Localization) -> None:
         self.localization = localization
+        # locale -> message attribute ID -> localized string
+        self._table: dict[str, dict[str, str]] = {}
+
+    async def load(self) -> None:
+        self._table = {}
+        for locale, localization in self.localization._localizations.items():
+            strings = self._table[locale] = {}
+            # The fallback bundles come last, so they are formatted first and overwritten by the desired locale
+            for bundle in reversed(list(localization._bundles())):
+                for message_id in bundle._messages:
+                    if not message_id.startswith(COMMAND_MESSAGE_PREFIX):
+                        continue
+                    message = bundle.get_message(message_id)
+                    for attribute_id, pattern in message.attributes.items():
+                        strings[f"{message_id}.{attribute_id}"] = bundle.format_pattern(pattern)[0]
+
+    async def unload(self) -> None:
+        self._table = {}
 
     async def translate(
         self,
@@ -105,9 +164,10 @@ class Translator(app_commands.Translator):
         locale: discord.Locale,
         context: app_commands.TranslationContextTypes,
     ) -> str | None:
-        pass
-
-        if context.location == app_commands.TranslationContextLocation.command_name:
-            pass
-
-            # TODO
+        strings = self._table.get(locale.value)
+        if strings is None:
+            return None
+        message_id = _command_message_id(string, context)
+        if message_id is None:
+            return None
+        return strings.get(message_id)
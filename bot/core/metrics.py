@@ -0,0 +1,139 @@
+import bisect
+import itertools
+
+
+class Counter:
+    """A monotonically increasing counter."""
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """Increment the counter.
+
+        Args:
+            amount (int, optional): The amount to increment by. Defaults to 1.
+        """
+        self.value += amount
+
+
+class Gauge:
+    """A value that can go up and down."""
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self.name = name
+        self.description = description
+        self.value: int | float = 0
+
+    def set(self, value: int | float) -> None:
+        """Set the value of the gauge.
+
+        Args:
+            value (int | float): The new value.
+        """
+        self.value = value
+
+
+class Histogram:
+    """Counts the observed values in buckets, each bucket counting the values up to its bound."""
+
+    def __init__(self, name: str, description: str = "", buckets: tuple[float, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # The last count is for the values above every bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram.
+
+        Args:
+            value (float): The observed value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def value(self) -> int:
+        return self.count
+
+    def snapshot(self) -> dict[str, int | float]:
+        """Get the cumulative count of every bucket, with the count and sum of the values."""
+        values: dict[str, int | float] = {f"{self.name}.count": self.count, f"{self.name}.sum": self.sum}
+        for bound, count in zip(self.buckets, itertools.accumulate(self.counts)):
+            values[f"{self.name}.le_{bound:g}"] = count
+        return values
+
+
+class MetricsRegistry:
+    """A class to hold all the in-process metrics of the bot."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, description, **kwargs)
+        elif not isinstance(metric, cls):
+            raise TypeError(f"Metric {name} is a {type(metric).__name__}, not a {cls.__name__}")
+        return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get a counter by name, creating it if it does not exist.
+
+        Args:
+            name (str): The name of the counter.
+            description (str, optional): A short description of what is counted.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Get a gauge by name, creating it if it does not exist.
+
+        Args:
+            name (str): The name of the gauge.
+            description (str, optional): A short description of what is measured.
+
+        Returns:
+            Gauge: The gauge.
+        """
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", buckets: tuple[float, ...] = ()) -> Histogram:
+        """Get a histogram by name, creating it with the given buckets if it does not exist.
+
+        Args:
+            name (str): The name of the histogram.
+            description (str, optional): A short description of what is measured.
+            buckets (tuple[float, ...], optional): The upper bound of each bucket.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def snapshot(self) -> dict[str, int | float]:
+        """Get the current value of every metric. Histograms are flattened into one value per bucket.
+
+        Returns:
+            dict[str, int | float]: A mapping of metric name to its value.
+        """
+        values: dict[str, int | float] = {}
+        for name, metric in self._metrics.items():
+            if isinstance(metric, Histogram):
+                values.update(metric.snapshot())
+            else:
+                values[name] = metric.value
+        return values
+
+
+metrics = MetricsRegistry()
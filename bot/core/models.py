@@ -1,8 +1,42 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, fields
+from typing import Any, Optional
 import asyncpg
 
 
+async def _update_columns(
+    executor: asyncpg.Pool | asyncpg.Connection,
+    table: str,
+    columns: tuple[str, ...],
+    guild_id: int,
+    values: dict[str, Any],
+) -> asyncpg.Record | None:
+    """Update some columns of the row of a guild in a single statement.
+
+    Args:
+        executor (asyncpg.Pool | asyncpg.Connection): The pool, or a connection to run it inside a transaction.
+        table (str): The table to update.
+        columns (tuple[str, ...]): The columns that can be updated.
+        guild_id (int): The guild ID of the row to update.
+        values (dict[str, Any]): The new value of each column to update.
+
+    Returns:
+        asyncpg.Record | None: The updated row or None if the guild was not found.
+
+    Raises:
+        ValueError: If no values are given or one of them is not an updatable column.
+    """
+    if not values:
+        raise ValueError("At least one column has to be updated.")
+    unknown = set(values) - set(columns)
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(sorted(unknown))}")
+
+    # The column names are checked above, so they are safe to put in the query
+    assignments = ", ".join(f"{column} = ${index}" for index, column in enumerate(values, start=2))
+    query = f"UPDATE {table} SET {assignments} WHERE guild_id = $1 RETURNING *"
+    return await executor.fetchrow(query, guild_id, *values.values())
+
+
 @dataclass
 class GuildConfig:
     guild_id: int
@@ -45,6 +79,63 @@ class GuildConfig:
             return None
         return cls.from_record(record)
 
+    @classmethod
+    async def update(
+        cls, executor: asyncpg.Pool | asyncpg.Connection, guild_id: int, **values: Any
+    ) -> Optional["GuildConfig"]:
+        """Update only the given columns of a guild config, in a single statement.
+
+        Examples:
+            >>> await GuildConfig.update(pool, guild_id, setup_complete=True, entry_log_channel_id=channel_id)
+
+        Args:
+            executor (asyncpg.Pool | asyncpg.Connection): The pool, or a connection to run it inside a transaction.
+            guild_id (int): The guild ID of the config to update.
+            **values: The new value of each column to update.
+
+        Returns:
+            Optional[GuildConfig]: The updated guild config or None if not found.
+        """
+        columns = tuple(field.name for field in fields(cls) if field.name != "guild_id")
+        record = await _update_columns(executor, "guilds", columns, guild_id, values)
+        if record is None:
+            return None
+        return cls.from_record(record)
+
+    @classmethod
+    async def restore(cls, pool: asyncpg.Pool, guild_id: int) -> tuple["GuildConfig", bool]:
+        """Get the config of a guild the bot joined, creating it or clearing its departure in the same statement.
+
+        Args:
+            pool (asyncpg.Pool): The database connection pool.
+            guild_id (int): The guild ID of the config.
+
+        Returns:
+            tuple[GuildConfig, bool]: The guild config and whether it was just created.
+        """
+
+        query = """
+            INSERT INTO guilds (guild_id) VALUES ($1)
+            ON CONFLICT (guild_id) DO UPDATE SET left_at = NULL
+            RETURNING *, xmax = 0 AS inserted
+        """
+        record = await pool.fetchrow(query, guild_id)
+        return cls.from_record(record), record["inserted"]
+
+    @classmethod
+    async def mark_departed(cls, pool: asyncpg.Pool, guild_id: int) -> None:
+        """Mark a guild as departed, so its data is deleted once the retention period is over.
+
+        Args:
+            pool (asyncpg.Pool): The database connection pool.
+            guild_id (int): The guild ID the bot left.
+        """
+
+        query = """
+            UPDATE guilds SET left_at = now() WHERE guild_id = $1 AND left_at IS NULL
+        """
+        await pool.execute(query, guild_id)
+
     async def save(self, pool: asyncpg.Pool) -> None:
         """Save/update the guild config to the database.
         If the guild config does not exist, it will be created.
@@ -115,6 +206,26 @@ class JoinGuardConfig:
             return None
         return cls.from_record(record)
 
+    @classmethod
+    async def update(
+        cls, executor: asyncpg.Pool | asyncpg.Connection, guild_id: int, **values: Any
+    ) -> Optional["JoinGuardConfig"]:
+        """Update only the given columns of a join guard config, in a single statement.
+
+        Args:
+            executor (asyncpg.Pool | asyncpg.Connection): The pool, or a connection to run it inside a transaction.
+            guild_id (int): The guild ID of the config to update.
+            **values: The new value of each column to update.
+
+        Returns:
+            Optional[JoinGuardConfig]: The updated join guard config or None if not found.
+        """
+        columns = tuple(field.name for field in fields(cls) if field.name != "guild_id")
+        record = await _update_columns(executor, "join_guard", columns, guild_id, values)
+        if record is None:
+            return None
+        return cls.from_record(record)
+
     async def save(self, pool: asyncpg.Pool) -> None:
         """Save/update the join guard config to the database.
         If the join guard config does not exist, it will be created.
@@ -140,3 +251,49 @@ class JoinGuardConfig:
             self.mobile,
             self.dm_locked,
         )
+
+
+@dataclass
+class VerificationResult:
+    guild_id: int
+    user_id: int
+    challenge: str
+    outcome: str
+
+    async def save(self, pool: asyncpg.Pool) -> bool:
+        """Save the verification result to the database.
+        A challenge only has one result, so saving it again does nothing.
+
+        Args:
+            pool (asyncpg.Pool): The database connection pool.
+
+        Returns:
+            bool: True if the result was saved, False if the challenge already had a result.
+        """
+
+        query = """
+            INSERT INTO verification_results (guild_id, user_id, challenge, outcome)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (challenge) DO NOTHING
+        """
+        status = await pool.execute(query, self.guild_id, self.user_id, self.challenge, self.outcome)
+        return status == "INSERT 0 1"
+
+    @classmethod
+    async def verified_users(cls, pool: asyncpg.Pool, guild_id: int, user_ids: list[int]) -> set[int]:
+        """Get which of the given users completed a verification in a guild.
+
+        Args:
+            pool (asyncpg.Pool): The database connection pool.
+            guild_id (int): The guild ID to search for.
+            user_ids (list[int]): The user IDs to search for.
+
+        Returns:
+            set[int]: The IDs of the users with a verified result.
+        """
+
+        query = """
+            SELECT DISTINCT user_id FROM verification_results
+            WHERE guild_id = $1 AND user_id = ANY($2::bigint[]) AND outcome = 'verified'
+        """
+        return {record["user_id"] for record in await pool.fetch(query, guild_id, user_ids)}
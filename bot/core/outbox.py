@@ -0,0 +1,211 @@
+import asyncio
+import datetime
+import json
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+import asyncpg
+from core.journal import JOIN_EVENTS_COLUMNS, JoinEvent
+from core.metrics import metrics
+from loguru import logger
+
+
+@dataclass
+class OutboxMessage:
+    """An action to run through the Discord client, e.g. a DM, a kick or a log post."""
+
+    kind: str
+    guild_id: int
+    user_id: int | None = None
+    payload: dict[str, Any] = field(default_factory=dict)
+    # Set for the messages claimed from the table
+    id: int | None = None
+    attempts: int = 0
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "OutboxMessage":
+        return cls(
+            kind=record["kind"],
+            guild_id=record["guild_id"],
+            user_id=record["user_id"],
+            payload=json.loads(record["payload"]),
+            id=record["id"],
+            attempts=record["attempts"],
+        )
+
+
+OutboxHandler = Callable[[OutboxMessage], Awaitable[Any]]
+
+
+class Outbox:
+    """A durable queue of the actions that follow a verdict, stored in the `outbox` table.
+
+    The messages are inserted in the same transaction as the verdict, so a restart in the
+    middle of a raid doesn't lose them. Workers claim batches with FOR UPDATE SKIP LOCKED,
+    so several bot processes can drain the same backlog, and a claimed message is leased
+    for `lease` seconds: if the process dies before acknowledging it, it is run again.
+    Delivery is at least once, the handlers must tolerate running twice.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        workers: int = 4,
+        batch_size: int = 20,
+        poll_interval: float = 1.0,
+        lease: float = 60.0,
+        max_attempts: int = 5,
+    ) -> None:
+        self.pool = pool
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = datetime.timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+
+        self._handlers: dict[str, OutboxHandler] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._wake_up = asyncio.Event()
+        self._done = metrics.counter("outbox_done", "Outbox messages run successfully.")
+        self._failed = metrics.counter("outbox_failed", "Outbox message runs that raised an error.")
+        self._dead = metrics.counter("outbox_dead", "Outbox messages dropped after too many attempts.")
+
+    def handler(self, kind: str) -> Callable[[OutboxHandler], OutboxHandler]:
+        """Register the handler of a kind of message.
+
+        Examples:
+            >>> @bot.outbox.handler("verification_dm")
+            ... async def send_verification_dm(message: OutboxMessage): ...
+        """
+
+        def decorator(func: OutboxHandler) -> OutboxHandler:
+            self._handlers[kind] = func
+            return func
+
+        return decorator
+
+    def remove_handler(self, kind: str) -> None:
+        self._handlers.pop(kind, None)
+
+    def has_handler(self, kind: str) -> bool:
+        """Check if the messages of a kind are handled, so it is worth queueing them."""
+        return kind in self._handlers
+
+    async def record_verdict(self, event: JoinEvent, messages: list[OutboxMessage]) -> None:
+        """Write a join event and the messages that follow from its verdict in a single transaction.
+
+        Args:
+            event (JoinEvent): The join event with the verdict.
+            messages (list[OutboxMessage]): The actions to run because of the verdict.
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    f"INSERT INTO join_events ({', '.join(JOIN_EVENTS_COLUMNS)}) VALUES ($1, $2, $3, $4, $5, $6, $7)",
+                    *event.to_record(),
+                )
+                await connection.executemany(
+                    "INSERT INTO outbox (kind, guild_id, user_id, payload) VALUES ($1, $2, $3, $4)",
+                    [
+                        (message.kind, message.guild_id, message.user_id, json.dumps(message.payload))
+                        for message in messages
+                    ],
+                )
+        self._wake_up.set()
+
+    def start(self) -> None:
+        """Start the workers."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(), name=f"outbox-worker-{index}") for index in range(self.workers)
+            ]
+
+    async def close(self) -> None:
+        """Stop the workers. The messages they claimed are run again once their lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.process_batch()
+            except Exception:
+                logger.exception("Error while processing the outbox")
+                claimed = 0
+            if claimed < self.batch_size:
+                # Idle, wait for a new message or the next poll, in case another process inserted some
+                self._wake_up.clear()
+                try:
+                    await asyncio.wait_for(self._wake_up.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def claim(self) -> list[OutboxMessage]:
+        """Claim a batch of the messages that are due, leasing them to this worker."""
+        records = await self.pool.fetch(
+            """
+            UPDATE outbox SET available_at = now() + $2::interval, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE available_at <= now()
+                ORDER BY available_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+            """,
+            self.batch_size,
+            self.lease,
+        )
+        return [OutboxMessage.from_record(record) for record in records]
+
+    async def process_batch(self) -> int:
+        """Claim a batch of messages, run them and acknowledge them in bulk.
+
+        Returns:
+            int: How many messages were claimed.
+        """
+        messages = await self.claim()
+        done: list[int] = []
+        retry: list[int] = []
+        for message in messages:
+            handler = self._handlers.get(message.kind)
+            if handler is None:
+                if message.attempts >= self.max_attempts:
+                    logger.error(f"Dropping outbox message {message.id}, no handler for kind {message.kind}")
+                    self._dead.inc()
+                    done.append(message.id)  # type: ignore
+                else:
+                    # Maybe handled by a cog that is not loaded yet, leave it leased
+                    logger.warning(f"No handler for the outbox messages of kind {message.kind}")
+                continue
+            try:
+                await handler(message)
+            except Exception:
+                self._failed.inc()
+                if message.attempts >= self.max_attempts:
+                    logger.exception(f"Dropping outbox message {message.id} after {message.attempts} attempts")
+                    self._dead.inc()
+                    done.append(message.id)  # type: ignore
+                else:
+                    logger.exception(f"Error while running outbox message {message.id}, retrying it")
+                    retry.append(message.id)  # type: ignore
+            else:
+                self._done.inc()
+                done.append(message.id)  # type: ignore
+
+        if done:
+            await self.pool.execute("DELETE FROM outbox WHERE id = ANY($1::bigint[])", done)
+        if retry:
+            # Exponential backoff instead of waiting for the whole lease
+            await self.pool.execute(
+                """
+                UPDATE outbox SET available_at = now() + interval '1 second' * power(2, attempts)
+                WHERE id = ANY($1::bigint[])
+                """,
+                retry,
+            )
+        return len(messages)
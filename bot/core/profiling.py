@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any, Callable, Coroutine
+
+# Deep recursion is cut instead of making every sample slower
+MAX_DEPTH = 128
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    # The line of the definition instead of the current line, so the samples of a function are merged
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Sample the stack of the event loop thread from a helper thread, at a fixed interval.
+
+    Each sample is prefixed with the name of the task that was running, so the time spent
+    by every coroutine of the same task is aggregated. The output is in the collapsed stack
+    format read by flamegraph.pl and speedscope.
+
+    Examples:
+        >>> profiler = SamplingProfiler(asyncio.get_running_loop())
+        >>> with profiler:
+        ...     await asyncio.sleep(10)
+        >>> profiler.collapsed()
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0.005) -> None:
+        self.loop = loop
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        # When set, only the samples taken while one of these tasks runs are kept
+        self.tasks: set[asyncio.Task] | None = None
+
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start sampling. Must be called from the event loop thread."""
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the helper thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self.loop)
+            if self.tasks is not None and task not in self.tasks:
+                continue
+
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(task.get_name() if task is not None else "<event loop>")
+            self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Get the samples in the collapsed stack format, one `frame;frame;frame count` line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+
+def profile_calls(
+    profiler: SamplingProfiler, func: Callable[..., Coroutine[Any, Any, Any]]
+) -> Callable[..., Coroutine[Any, Any, Any]]:
+    """Wrap a coroutine function so the profiler only keeps the samples taken while it runs.
+
+    Args:
+        profiler (SamplingProfiler): The profiler to restrict to the calls of `func`.
+        func (Callable[..., Coroutine]): The coroutine function to profile, e.g. a listener.
+
+    Returns:
+        Callable[..., Coroutine]: The wrapped coroutine function.
+    """
+    profiler.tasks = set()
+
+    async def wrapper(*args, **kwargs):
+        task = asyncio.current_task()
+        profiler.tasks.add(task)  # type: ignore
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            profiler.tasks.discard(task)  # type: ignore
+            wrapper.calls += 1  # type: ignore
+            wrapper.elapsed += time.perf_counter() - start  # type: ignore
+
+    wrapper.calls = 0  # type: ignore
+    wrapper.elapsed = 0.0  # type: ignore
+    return wrapper
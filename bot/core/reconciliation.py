@@ -0,0 +1,78 @@
+import time
+from dataclasses import dataclass
+
+import asyncpg
+from core.metrics import metrics
+from core.models import GuildConfig
+
+
+@dataclass
+class ReconciliationReport:
+    """What changed in the `guilds` table after reconciling it with the gateway."""
+
+    guilds: int
+    inserted: list[GuildConfig]
+    rejoined: list[GuildConfig]
+    departed: list[int]
+    duration: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.guilds} guilds reconciled in {self.duration * 1000:.1f}ms: "
+            f"{len(self.inserted)} inserted, {len(self.rejoined)} rejoined, {len(self.departed)} departed"
+        )
+
+
+async def reconcile_guilds(pool: asyncpg.Pool, guild_ids: list[int]) -> ReconciliationReport:
+    """Make the `guilds` table match the guilds the bot is in, without any API call.
+
+    Guilds without a row are inserted, guilds that were marked as departed are restored
+    and guilds the bot is not in anymore are marked as departed, all in a single transaction.
+
+    Args:
+        pool (asyncpg.Pool): The database connection pool.
+        guild_ids (list[int]): The IDs of every guild the gateway reported.
+
+    Returns:
+        ReconciliationReport: The rows that were changed.
+    """
+    start = time.perf_counter()
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            # xmax is 0 for the rows that were inserted, and not for the ones that were updated
+            upserted = await connection.fetch(
+                """
+                INSERT INTO guilds (guild_id)
+                SELECT unnest($1::bigint[])
+                ON CONFLICT (guild_id) DO UPDATE SET left_at = NULL WHERE guilds.left_at IS NOT NULL
+                RETURNING *, xmax = 0 AS inserted
+                """,
+                guild_ids,
+            )
+            # An anti-join, so the planner can hash the present guilds instead of scanning the array for every row
+            departed = await connection.fetch(
+                """
+                UPDATE guilds SET left_at = now()
+                WHERE left_at IS NULL
+                AND NOT EXISTS (SELECT 1 FROM unnest($1::bigint[]) AS present(id) WHERE present.id = guilds.guild_id)
+                RETURNING guild_id
+                """,
+                guild_ids,
+            )
+
+    report = ReconciliationReport(
+        guilds=len(guild_ids),
+        inserted=[GuildConfig.from_record(record) for record in upserted if record["inserted"]],
+        rejoined=[GuildConfig.from_record(record) for record in upserted if not record["inserted"]],
+        departed=[record["guild_id"] for record in departed],
+        duration=time.perf_counter() - start,
+    )
+    metrics.gauge("reconciliation.seconds", "How long the last guild reconciliation took.").set(report.duration)
+    metrics.counter("reconciliation.inserted", "Guilds inserted by the reconciliation.").inc(len(report.inserted))
+    metrics.counter("reconciliation.rejoined", "Departed guilds restored by the reconciliation.").inc(
+        len(report.rejoined)
+    )
+    metrics.counter("reconciliation.departed", "Guilds marked as departed by the reconciliation.").inc(
+        len(report.departed)
+    )
+    return report
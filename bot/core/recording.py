@@ -0,0 +1,155 @@
+import hashlib
+import json
+import random
+import secrets
+import string
+import time
+from dataclasses import asdict, dataclass
+from typing import IO, Iterator
+
+import discord
+
+JOIN = "join"
+REMOVE = "remove"
+
+_SNOWFLAKE_TIMESTAMP_SHIFT = 22
+_SNOWFLAKE_LOW_BITS = (1 << _SNOWFLAKE_TIMESTAMP_SHIFT) - 1
+
+
+@dataclass
+class MemberEvent:
+    """The parts of a member join or remove payload the join guard looks at.
+
+    The field names are short because one line is written per event, raids included.
+    """
+
+    k: str  # JOIN or REMOVE
+    t: float  # When the event was received, as a unix timestamp
+    g: int  # Guild ID
+    u: int  # User ID, the account creation time is taken from it
+    n: str  # Username
+    a: str | None = None  # Avatar key
+    b: bool = False  # Is a bot
+    m: bool = False  # Is on mobile
+    x: bool = False  # Has an animated avatar, a guild avatar or boosts, the nitro hints found without an API call
+    j: float | None = None  # Joined at, as a unix timestamp
+
+    @classmethod
+    def from_member(cls, kind: str, member: discord.Member) -> "MemberEvent":
+        return cls(
+            k=kind,
+            t=time.time(),
+            g=member.guild.id,
+            u=member.id,
+            n=member.name,
+            a=member.avatar.key if member.avatar else None,
+            b=member.bot,
+            m=member.is_on_mobile(),
+            x=bool(member.display_avatar.is_animated() or member.premium_since or member.guild_avatar),
+            j=member.joined_at.timestamp() if member.joined_at else None,
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "MemberEvent":
+        return cls(**json.loads(line))
+
+
+class Anonymizer:
+    """Replace the IDs, names and avatars of a recording with stable pseudonyms.
+
+    The same input always gives the same output within a recording, so repeated
+    users, similar names and duplicate avatars are still detected on replay.
+    The creation time in the snowflakes and the shape of the names are kept.
+    The key is random and never written, so the pseudonyms can't be reversed.
+    """
+
+    def __init__(self, key: bytes | None = None) -> None:
+        self._key = key or secrets.token_bytes(16)
+        rng = random.Random(self._key)
+        self._letters = dict(zip(string.ascii_lowercase, rng.sample(string.ascii_lowercase, 26)))
+        self._digits = dict(zip(string.digits, rng.sample(string.digits, 10)))
+
+    def _hash(self, value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8, key=self._key).digest(), "big")
+
+    def snowflake(self, snowflake: int) -> int:
+        # Keep the timestamp, scramble the worker, process and increment bits
+        timestamp = snowflake >> _SNOWFLAKE_TIMESTAMP_SHIFT
+        return (timestamp << _SNOWFLAKE_TIMESTAMP_SHIFT) | (self._hash(str(snowflake)) & _SNOWFLAKE_LOW_BITS)
+
+    def _char(self, char: str) -> str:
+        lower = char.lower()
+        if lower in self._letters:
+            replaced = self._letters[lower]
+            return replaced.upper() if char.isupper() else replaced
+        if char in self._digits:
+            return self._digits[char]
+        if char in "._-":
+            return char
+        return string.ascii_lowercase[self._hash(char) % 26]
+
+    def name(self, name: str) -> str:
+        return "".join(self._char(char) for char in name)
+
+    def avatar(self, avatar: str | None) -> str | None:
+        if avatar is None:
+            return None
+        return f"{self._hash(avatar):016x}"
+
+    def event(self, event: MemberEvent) -> MemberEvent:
+        event.g = self.snowflake(event.g)
+        event.u = self.snowflake(event.u)
+        event.n = self.name(event.n)
+        event.a = self.avatar(event.a)
+        return event
+
+
+class MemberEventRecorder:
+    """Append the member join and remove events to a JSON lines file, to replay them later.
+
+    Examples:
+        >>> recorder = MemberEventRecorder("raid.jsonl", anonymize=True)
+        >>> recorder.record(JOIN, member)
+        >>> recorder.close()
+    """
+
+    def __init__(self, path: str, *, anonymize: bool = False) -> None:
+        self.path = path
+        self.anonymizer = Anonymizer() if anonymize else None
+        self.events = 0
+        self._file: IO[str] = open(path, "a", encoding="utf-8")
+
+    def record(self, kind: str, member: discord.Member) -> None:
+        """Append an event to the file.
+
+        Args:
+            kind (str): JOIN or REMOVE.
+            member (discord.Member): The member that joined or left.
+        """
+        event = MemberEvent.from_member(kind, member)
+        if self.anonymizer is not None:
+            event = self.anonymizer.event(event)
+        # Buffered by the file object, so a raid doesn't mean one write syscall per join
+        self._file.write(event.to_json() + "\n")
+        self.events += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_events(path: str) -> Iterator[MemberEvent]:
+    """Read the events of a recording, in the order they were received.
+
+    Args:
+        path (str): The path of the recording.
+
+    Yields:
+        MemberEvent: The recorded events.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield MemberEvent.from_json(line)
@@ -0,0 +1,178 @@
+import asyncio
+import datetime
+
+import asyncpg
+from core.metrics import metrics
+from loguru import logger
+
+# Every table with per guild data, in the order they are deleted from. `guilds` goes last because of the foreign keys.
+GUILD_DATA_TABLES = (
+    "join_guard",
+    "join_events",
+    "join_stats_minutely",
+    "join_stats_hourly",
+    "verification_results",
+    "outbox",
+)
+
+
+class DepartedGuildsCleaner:
+    """Delete the data of the guilds the bot left a while ago.
+
+    Guilds are marked with `left_at` when the bot leaves them, and only deleted after
+    a grace period, in case the bot is added back. The rows are deleted in chunks of
+    at most `chunk_size` rows, each in its own transaction and with a pause between them,
+    so a guild with millions of join events never holds locks or a connection for long.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        grace_period: datetime.timedelta = datetime.timedelta(days=30),
+        batch_size: int = 50,
+        chunk_size: int = 5000,
+        chunk_pause: float = 0.1,
+        max_chunks: int = 200,
+        interval: float = 3600.0,
+    ) -> None:
+        self.pool = pool
+        self.grace_period = grace_period
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.max_chunks = max_chunks
+        self.interval = interval
+
+        self._task: asyncio.Task | None = None
+        self._deleted = metrics.counter("departed_guilds_deleted", "Departed guilds whose data was deleted.")
+        self._deleted_rows = metrics.counter("departed_guild_rows_deleted", "Rows of departed guilds deleted.")
+
+    def start(self) -> None:
+        """Start the background task that deletes the departed guilds."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="departed-guilds-cleaner")
+
+    async def close(self) -> None:
+        """Stop the background task. The chunk being deleted is rolled back, the previous ones stay deleted."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                deleted = await self.run_once()
+                if deleted:
+                    logger.info(f"Deleted the data of {deleted} departed guilds")
+            except Exception:
+                logger.exception("Error while deleting the departed guilds")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Delete the guilds whose grace period is over, stopping after `max_chunks` full chunks of rows.
+
+        The guilds whose rows are not all deleted yet are picked up again on the next run.
+
+        Returns:
+            int: How many guilds were deleted.
+        """
+        total = 0
+        chunks = 0
+        while True:
+            guild_ids = await self.pool.fetchval(
+                """
+                SELECT coalesce(array_agg(guild_id), '{}') FROM (
+                    SELECT guild_id FROM guilds
+                    WHERE left_at IS NOT NULL AND left_at < now() - $1::interval
+                    ORDER BY left_at
+                    LIMIT $2
+                ) expired
+                """,
+                self.grace_period,
+                self.batch_size,
+            )
+            if not guild_ids:
+                break
+
+            for table in GUILD_DATA_TABLES:
+                # Only the full chunks count, the last one of a table is cheap
+                while await self.delete_chunk(table, guild_ids) >= self.chunk_size:
+                    chunks += 1
+                    if chunks >= self.max_chunks:
+                        return total
+                    await asyncio.sleep(self.chunk_pause)
+
+            deleted = await self.delete_guilds(guild_ids)
+            total += deleted
+            # Stop on the guilds locked by a rejoin rather than selecting them again
+            if not deleted or len(guild_ids) < self.batch_size:
+                break
+        return total
+
+    async def delete_chunk(self, table: str, guild_ids: list[int]) -> int:
+        """Delete up to `chunk_size` rows of a table that belong to guilds still past their grace period.
+
+        Args:
+            table (str): One of `GUILD_DATA_TABLES`.
+            guild_ids (list[int]): The guilds to delete the rows of.
+
+        Returns:
+            int: How many rows were deleted.
+        """
+        # The grace period is checked again, so a guild the bot was added back to keeps its remaining rows
+        status = await self.pool.execute(
+            f"""
+            DELETE FROM {table} WHERE ctid = ANY(ARRAY(
+                SELECT ctid FROM {table}
+                WHERE guild_id IN (
+                    SELECT guild_id FROM guilds
+                    WHERE guild_id = ANY($1::bigint[]) AND left_at IS NOT NULL AND left_at < now() - $2::interval
+                )
+                LIMIT $3
+            ))
+            """,
+            guild_ids,
+            self.grace_period,
+            self.chunk_size,
+        )
+        deleted = int(status.split()[-1])
+        self._deleted_rows.inc(deleted)
+        return deleted
+
+    async def delete_guilds(self, guild_ids: list[int]) -> int:
+        """Delete the guilds whose rows were deleted, if their grace period is still over.
+
+        Args:
+            guild_ids (list[int]): The guilds to delete.
+
+        Returns:
+            int: How many guilds were deleted.
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                # Skips the guilds the bot is rejoining right now
+                guild_ids = await connection.fetchval(
+                    """
+                    SELECT coalesce(array_agg(guild_id), '{}') FROM (
+                        SELECT guild_id FROM guilds
+                        WHERE guild_id = ANY($1::bigint[]) AND left_at IS NOT NULL AND left_at < now() - $2::interval
+                        FOR UPDATE SKIP LOCKED
+                    ) expired
+                    """,
+                    guild_ids,
+                    self.grace_period,
+                )
+                if not guild_ids:
+                    return 0
+                # Only the rows added since their chunk was deleted are left
+                for table in GUILD_DATA_TABLES:
+                    await connection.execute(f"DELETE FROM {table} WHERE guild_id = ANY($1::bigint[])", guild_ids)
+                await connection.execute("DELETE FROM guilds WHERE guild_id = ANY($1::bigint[])", guild_ids)
+
+        self._deleted.inc(len(guild_ids))
+        return len(guild_ids)
@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+from dataclasses import dataclass
+
+import asyncpg
+import discord
+from loguru import logger
+
+MINUTE = datetime.timedelta(minutes=1)
+HOUR = datetime.timedelta(hours=1)
+DAY = datetime.timedelta(days=1)
+
+
+def _truncate(moment: datetime.datetime, resolution: datetime.timedelta) -> datetime.datetime:
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    return moment - (moment - epoch) % resolution
+
+
+@dataclass
+class JoinStats:
+    """How many members joined a guild and were flagged by the join guard in the last hour and day."""
+
+    joins_last_hour: int = 0
+    flagged_last_hour: int = 0
+    joins_last_day: int = 0
+    flagged_last_day: int = 0
+
+    def add(
+        self,
+        bucket: datetime.datetime,
+        joins: int,
+        flagged: int,
+        hour_since: datetime.datetime,
+        day_since: datetime.datetime,
+    ) -> None:
+        if bucket >= day_since:
+            self.joins_last_day += joins
+            self.flagged_last_day += flagged
+        if bucket >= hour_since:
+            self.joins_last_hour += joins
+            self.flagged_last_hour += flagged
+
+
+class JoinStatsRollup:
+    """Per guild join statistics, pre-aggregated in minute and hour buckets.
+
+    Joins and flagged members are counted in memory per guild and minute, and periodically
+    added to `join_stats_minutely`. Minutes older than the previous hour are then
+    compacted into `join_stats_hourly`, so reading the stats of the last day of a
+    guild only touches a couple hundred rows, no matter how many members joined it.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        flush_interval: float = 60.0,
+        compact_interval: float = 3600.0,
+    ) -> None:
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+
+        # (guild_id, minute) -> [joins, flagged]
+        self._pending: dict[tuple[int, datetime.datetime], list[int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def record(self, guild_id: int, *, flagged: bool = False, at: datetime.datetime | None = None) -> None:
+        """Count a join in a guild.
+
+        Args:
+            guild_id (int): The guild the member joined.
+            flagged (bool, optional): If the member was flagged by the join guard. Defaults to False.
+            at (datetime.datetime | None, optional): When the member joined. Defaults to utcnow.
+        """
+        key = (guild_id, _truncate(at or discord.utils.utcnow(), MINUTE))
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = [0, 0]
+        counters[0] += 1
+        if flagged:
+            counters[1] += 1
+
+    def start(self) -> None:
+        """Start the background task that flushes and compacts the buckets."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="join-stats-rollup")
+
+    async def close(self) -> None:
+        """Stop the background task and flush the pending buckets."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_compaction = loop.time()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if loop.time() >= next_compaction:
+                    await self.compact()
+                    next_compaction = loop.time() + self.compact_interval
+            except Exception:
+                logger.exception("Error while updating the join stats rollups")
+
+    async def flush(self) -> int:
+        """Add the counters kept in memory to the minute buckets in the database.
+
+        Returns:
+            int: How many minute buckets were written.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, {}
+            query = """
+                INSERT INTO join_stats_minutely (guild_id, bucket, joins, flagged)
+                SELECT * FROM unnest($1::bigint[], $2::timestamptz[], $3::int[], $4::int[])
+                ON CONFLICT (guild_id, bucket) DO UPDATE
+                SET joins = join_stats_minutely.joins + excluded.joins,
+                    flagged = join_stats_minutely.flagged + excluded.flagged
+            """
+            try:
+                await self.pool.execute(
+                    query,
+                    [guild_id for guild_id, _ in pending],
+                    [bucket for _, bucket in pending],
+                    [joins for joins, _ in pending.values()],
+                    [flagged for _, flagged in pending.values()],
+                )
+            except BaseException:
+                # Put the counters back, merging with what was counted in the meantime
+                for key, (joins, flagged) in pending.items():
+                    counters = self._pending.setdefault(key, [0, 0])
+                    counters[0] += joins
+                    counters[1] += flagged
+                raise
+            return len(pending)
+
+    async def compact(self, now: datetime.datetime | None = None) -> None:
+        """Move the minute buckets older than the previous hour into hour buckets.
+
+        Args:
+            now (datetime.datetime | None, optional): The current time. Defaults to utcnow.
+        """
+        cutoff = _truncate(now or discord.utils.utcnow(), HOUR) - HOUR
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    """
+                    INSERT INTO join_stats_hourly (guild_id, bucket, joins, flagged)
+                    SELECT guild_id, date_trunc('hour', bucket), sum(joins), sum(flagged)
+                    FROM join_stats_minutely
+                    WHERE bucket < $1
+                    GROUP BY guild_id, date_trunc('hour', bucket)
+                    ON CONFLICT (guild_id, bucket) DO UPDATE
+                    SET joins = join_stats_hourly.joins + excluded.joins,
+                        flagged = join_stats_hourly.flagged + excluded.flagged
+                    """,
+                    cutoff,
+                )
+                await connection.execute("DELETE FROM join_stats_minutely WHERE bucket < $1", cutoff)
+
+    async def get_stats(self, guild_id: int) -> JoinStats:
+        """Get the join statistics of the last hour and day of a guild.
+
+        Notes:
+            Hour buckets are counted whole, so the last day can include up to one extra hour.
+
+        Args:
+            guild_id (int): The guild ID to get the stats for.
+
+        Returns:
+            JoinStats: The join statistics.
+        """
+        now = discord.utils.utcnow()
+        hour_since = _truncate(now - HOUR, MINUTE)
+        day_since = _truncate(now - DAY, HOUR)
+        query = """
+            SELECT bucket, joins, flagged FROM join_stats_minutely WHERE guild_id = $1 AND bucket >= $2
+            UNION ALL
+            SELECT bucket, joins, flagged FROM join_stats_hourly WHERE guild_id = $1 AND bucket >= $2
+        """
+        stats = JoinStats()
+        for record in await self.pool.fetch(query, guild_id, day_since):
+            stats.add(record["bucket"], record["joins"], record["flagged"], hour_since, day_since)
+
+        # Counters that were not flushed yet
+        for (pending_guild_id, bucket), (joins, flagged) in self._pending.items():
+            if pending_guild_id == guild_id:
+                stats.add(bucket, joins, flagged, hour_since, day_since)
+        return stats
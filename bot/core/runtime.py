@@ -0,0 +1,86 @@
+import asyncio
+from dataclasses import dataclass
+
+import aiohttp
+import discord
+from loguru import logger
+
+DEFAULT_PROFILE = "default"
+PERFORMANCE_PROFILE = "performance"
+
+
+@dataclass
+class RuntimeProfile:
+    """What the selected runtime profile actually enabled, the optional packages may be missing."""
+
+    name: str
+    uvloop: bool = False
+    orjson: bool = False
+    tuned_connector: bool = False
+
+    def __str__(self) -> str:
+        enabled = [name for name in ("uvloop", "orjson", "tuned_connector") if getattr(self, name)]
+        return f"{self.name} ({', '.join(enabled) or 'asyncio, json'})"
+
+
+def _install_uvloop() -> bool:
+    try:
+        import uvloop  # type: ignore
+    except ImportError:
+        logger.warning("uvloop is not installed, using the default asyncio event loop")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def _install_orjson() -> bool:
+    try:
+        import orjson  # type: ignore
+    except ImportError:
+        logger.warning("orjson is not installed, using json to decode the gateway and HTTP payloads")
+        return False
+    # discord.py looks these up on every payload, so replacing them switches the gateway and HTTP decoding
+    discord.utils._from_json = orjson.loads  # type: ignore
+    discord.utils._to_json = lambda obj: orjson.dumps(obj).decode("utf-8")  # type: ignore
+    return True
+
+
+def apply_runtime_profile(name: str) -> RuntimeProfile:
+    """Apply a runtime profile. Must be called before the event loop is created.
+
+    Args:
+        name (str): DEFAULT_PROFILE or PERFORMANCE_PROFILE.
+
+    Returns:
+        RuntimeProfile: What was enabled.
+    """
+    if name != PERFORMANCE_PROFILE:
+        if name != DEFAULT_PROFILE:
+            logger.warning(f"Unknown runtime profile {name}, using the default one")
+        return RuntimeProfile(DEFAULT_PROFILE, orjson=discord.utils.HAS_ORJSON)
+    return RuntimeProfile(
+        PERFORMANCE_PROFILE, uvloop=_install_uvloop(), orjson=_install_orjson(), tuned_connector=True
+    )
+
+
+def create_web_client(profile: RuntimeProfile) -> aiohttp.ClientSession:
+    """Create the HTTP session used by the bot for everything but the Discord API.
+
+    Args:
+        profile (RuntimeProfile): The applied runtime profile.
+
+    Returns:
+        aiohttp.ClientSession: The session, with a tuned connector in the performance profile.
+    """
+    if not profile.tuned_connector:
+        return aiohttp.ClientSession()
+    connector = aiohttp.TCPConnector(
+        limit=200,
+        limit_per_host=50,
+        # Resolve each host once every 5 minutes instead of on every new connection
+        ttl_dns_cache=300,
+        # Keep the idle connections around, the same few hosts are called over and over
+        keepalive_timeout=60,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(connector=connector)
@@ -0,0 +1,255 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+from core.metrics import metrics
+from loguru import logger
+
+T = TypeVar("T")
+
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@dataclass
+class GuildQueueStats:
+    """How many jobs of a guild ran or were dropped, and how long they waited."""
+
+    processed: int = 0
+    dropped: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.processed if self.processed else 0.0
+
+
+@dataclass
+class GuildQueue(Generic[T]):
+    """The pending jobs of a guild."""
+
+    stats: GuildQueueStats
+    weight: float = 1.0
+    queue: deque[tuple[float, T]] = field(default_factory=deque)
+    running: int = 0
+    deficit: float = 0.0
+    in_ring: bool = False
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+
+
+class FairScheduler(Generic[T]):
+    """Run jobs grouped by guild on a bounded pool of workers, so one busy guild can't starve the others.
+
+    Each guild has its own queue, and the workers take the next job with deficit round robin:
+    every guild with pending jobs gets `weight` jobs per round. A guild never has more than
+    `per_guild_concurrency` jobs running, and never more than `max_backlog` waiting. When the
+    backlog is full, the newest or oldest job is dropped depending on `overflow`, and handed
+    to `on_overflow` if set, so the caller can still deal with it in a cheaper way.
+
+    The queues of idle guilds are dropped, but their statistics are kept for the
+    `max_tracked_guilds` guilds with the most recent jobs, so a burst can still be
+    inspected after it is over.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[T], Awaitable[Any]],
+        *,
+        workers: int = 8,
+        per_guild_concurrency: int = 2,
+        max_backlog: int = 500,
+        overflow: str = DROP_NEWEST,
+        on_overflow: Callable[[int, T], Any] | None = None,
+        name: str = "scheduler",
+        max_tracked_guilds: int = 1000,
+    ) -> None:
+        if overflow not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown overflow policy {overflow}")
+        self.handler = handler
+        self.workers = workers
+        self.per_guild_concurrency = per_guild_concurrency
+        self.max_backlog = max_backlog
+        self.overflow = overflow
+        self.on_overflow = on_overflow
+        self.name = name
+        self.max_tracked_guilds = max_tracked_guilds
+
+        self.guilds: dict[int, GuildQueue[T]] = {}
+        # Least recently used first
+        self.stats: OrderedDict[int, GuildQueueStats] = OrderedDict()
+        self._weights: dict[int, float] = {}
+        self._ring: deque[int] = deque()
+        self._work_available = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+        self._wait = metrics.histogram(
+            f"{name}.wait.seconds", "How long the jobs waited in their queue.", WAIT_BUCKETS
+        )
+        self._backlog = metrics.gauge(f"{name}.backlog", "How many jobs are waiting in every queue.")
+        self._dropped = metrics.counter(f"{name}.dropped", "Jobs dropped because their guild backlog was full.")
+
+    def start(self) -> None:
+        """Start the workers."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(), name=f"{self.name}-worker-{index}") for index in range(self.workers)
+            ]
+
+    async def close(self) -> None:
+        """Stop the workers. The jobs still waiting are discarded."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        pending = sum(state.depth for state in self.guilds.values())
+        if pending:
+            logger.warning(f"Discarding {pending} jobs of the {self.name} still waiting on shutdown")
+        self.guilds.clear()
+        self._ring.clear()
+
+    def set_weight(self, guild_id: int, weight: float) -> None:
+        """Set how many jobs of a guild are run per round, relative to the others. Defaults to 1."""
+        self._weights[guild_id] = weight
+        if guild_id in self.guilds:
+            self.guilds[guild_id].weight = weight
+
+    def pending(self, guild_id: int) -> int:
+        """Get how many jobs of a guild are waiting or running."""
+        state = self.guilds.get(guild_id)
+        return state.depth + state.running if state is not None else 0
+
+    def submit(self, guild_id: int, job: T) -> bool:
+        """Queue a job of a guild.
+
+        Args:
+            guild_id (int): The guild the job belongs to.
+            job (T): The job, passed to the handler.
+
+        Returns:
+            bool: False if the backlog of the guild was full and the job was dropped.
+        """
+        state = self.guilds.get(guild_id)
+        if state is None:
+            state = self.guilds[guild_id] = GuildQueue(
+                self._get_stats(guild_id), weight=self._weights.get(guild_id, 1.0)
+            )
+
+        accepted = True
+        if state.depth >= self.max_backlog:
+            if self.overflow == DROP_NEWEST:
+                self._drop(guild_id, state, job)
+                return False
+            self._drop(guild_id, state, state.queue.popleft()[1])
+            accepted = False
+
+        state.queue.append((time.monotonic(), job))
+        self._backlog.set(self._backlog.value + accepted)
+        self._schedule(guild_id, state)
+        return True
+
+    def _get_stats(self, guild_id: int) -> GuildQueueStats:
+        stats = self.stats.get(guild_id)
+        if stats is None:
+            stats = self.stats[guild_id] = GuildQueueStats()
+            if len(self.stats) > self.max_tracked_guilds:
+                self.stats.popitem(last=False)
+        else:
+            self.stats.move_to_end(guild_id)
+        return stats
+
+    def _drop(self, guild_id: int, state: GuildQueue[T], job: T) -> None:
+        state.stats.dropped += 1
+        self._dropped.inc()
+        if self.on_overflow is not None:
+            self.on_overflow(guild_id, job)
+
+    def _schedule(self, guild_id: int, state: GuildQueue[T]) -> None:
+        if not state.in_ring and state.queue and state.running < self.per_guild_concurrency:
+            state.in_ring = True
+            self._ring.append(guild_id)
+            self._work_available.set()
+
+    def _next(self) -> tuple[int, GuildQueue[T], float, T] | None:
+        while self._ring:
+            guild_id = self._ring[0]
+            state = self.guilds[guild_id]
+            if not state.queue or state.running >= self.per_guild_concurrency:
+                # Put back in the ring by _schedule when a job is queued or finishes
+                self._ring.popleft()
+                state.in_ring = False
+                state.deficit = 0.0
+                if not state.queue and not state.running:
+                    self.guilds.pop(guild_id, None)
+                continue
+
+            if state.deficit < 1:
+                state.deficit += state.weight
+                if state.deficit < 1:
+                    # A weight below 1 takes a few rounds to earn a job
+                    self._ring.rotate(-1)
+                    continue
+            state.deficit -= 1
+            enqueued_at, job = state.queue.popleft()
+            state.running += 1
+            if state.deficit < 1:
+                # Used its share of this round, go to the back
+                self._ring.rotate(-1)
+            return guild_id, state, enqueued_at, job
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            next_job = self._next()
+            if next_job is None:
+                self._work_available.clear()
+                await self._work_available.wait()
+                continue
+
+            guild_id, state, enqueued_at, job = next_job
+            waited = time.monotonic() - enqueued_at
+            self._wait.observe(waited)
+            self._backlog.set(self._backlog.value - 1)
+            stats = state.stats
+            stats.processed += 1
+            stats.total_wait += waited
+            stats.max_wait = max(stats.max_wait, waited)
+            try:
+                await self.handler(job)
+            except Exception:
+                logger.exception(f"Error while running a job of guild {guild_id} in the {self.name}")
+            finally:
+                state.running -= 1
+                if state.queue:
+                    self._schedule(guild_id, state)
+                elif not state.running and not state.in_ring:
+                    # Idle guilds are forgotten, so the dict only holds the guilds with recent joins
+                    self.guilds.pop(guild_id, None)
+
+    def report(self, limit: int = 10) -> str:
+        """Get the queue depth and wait times of the busiest guilds, including the recently idle ones."""
+        rows = []
+        for guild_id, stats in self.stats.items():
+            state = self.guilds.get(guild_id)
+            depth, running = (state.depth, state.running) if state is not None else (0, 0)
+            rows.append((depth, running, stats.dropped, stats.max_wait, guild_id, stats))
+        rows.sort(key=lambda row: row[:4], reverse=True)
+
+        lines = [
+            f"{len(self.guilds)} active guilds, {int(self._backlog.value)} jobs waiting, "
+            f"stats of the last {len(self.stats)} guilds"
+        ]
+        for depth, running, _, _, guild_id, stats in rows[:limit]:
+            lines.append(
+                f"{guild_id:>20}  depth {depth:>5}  running {running}  processed {stats.processed:>6}  "
+                f"dropped {stats.dropped:>5}  wait mean {stats.mean_wait * 1000:7.1f}ms "
+                f"max {stats.max_wait * 1000:7.1f}ms"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+
+DISCORD_EPOCH_MS = 1420070400000
+
+# How much each suspicious signal adds to the score of a joining member
+SIGNAL_WEIGHTS = {
+    "young_account": 2.0,
+    "clustered_creation": 1.0,
+    "similar_names": 1.0,
+    "duplicate_avatar": 1.0,
+    "not_mobile": 0.5,
+    "not_nitro": 1.0,
+    "dm_closed": 1.0,
+    "guild_hopping": 1.5,
+}
+# Members with a score equal or higher than this are flagged
+FLAG_SCORE = 3.0
+
+
+def snowflake_timestamps(ids: np.ndarray) -> np.ndarray:
+    """Extract the creation time of a batch of snowflakes.
+
+    Args:
+        ids (np.ndarray): The snowflakes.
+
+    Returns:
+        np.ndarray: The creation times in milliseconds since the unix epoch, as int64.
+    """
+    return (np.asarray(ids, dtype=np.uint64) >> np.uint64(22)).astype(np.int64) + DISCORD_EPOCH_MS
+
+
+@dataclass
+class BatchFeatures:
+    """The features of a batch of joining members, one element per member.
+
+    Times are in seconds.
+    """
+
+    account_age: np.ndarray
+    join_delta: np.ndarray
+    # How many other members of the batch were created within the clustering window
+    creation_cluster: np.ndarray
+
+
+class BatchScorer:
+    """Scores a batch of joining members at once using only their IDs and join times.
+
+    Everything is computed with array operations, so scoring hundreds of members
+    during a raid costs about as much as scoring a handful of them one by one.
+    Only the signals that don't need any API call are used.
+    """
+
+    def __init__(
+        self,
+        *,
+        join_delta_threshold: int = 86400,
+        cluster_window: float = 300.0,
+        cluster_size: int = 3,
+        weights: dict[str, float] = SIGNAL_WEIGHTS,
+    ) -> None:
+        """Initializes the scorer
+
+        Args:
+            join_delta_threshold (int, optional): Accounts younger than this when joining are suspicious.
+                Defaults to one day.
+            cluster_window (float, optional): Accounts created within this many seconds of each other
+                are considered as created together. Defaults to 5 minutes.
+            cluster_size (int, optional): How many other accounts of the batch have to be created together
+                with an account for it to be suspicious. Defaults to 3.
+            weights (dict[str, float], optional): The weight of each signal. Defaults to SIGNAL_WEIGHTS.
+        """
+        self.join_delta_threshold = join_delta_threshold
+        self.cluster_window = cluster_window
+        self.cluster_size = cluster_size
+        self.weights = weights
+
+    def features(
+        self,
+        user_ids: np.ndarray,
+        joined_at: np.ndarray,
+        now: float | None = None,
+    ) -> BatchFeatures:
+        """Compute the features of a batch.
+
+        Args:
+            user_ids (np.ndarray): The IDs of the members.
+            joined_at (np.ndarray): When each member joined, in seconds since the unix epoch.
+            now (float | None, optional): The current time in seconds since the unix epoch. Defaults to now.
+
+        Returns:
+            BatchFeatures: The features.
+        """
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+        created_at = snowflake_timestamps(user_ids) / 1000
+        joined_at = np.asarray(joined_at, dtype=np.float64)
+
+        # For each account, count the accounts created inside [created_at - window, created_at + window]
+        ordered = np.sort(created_at)
+        lower = np.searchsorted(ordered, created_at - self.cluster_window, side="left")
+        upper = np.searchsorted(ordered, created_at + self.cluster_window, side="right")
+
+        return BatchFeatures(
+            account_age=now - created_at,
+            join_delta=joined_at - created_at,
+            creation_cluster=upper - lower - 1,
+        )
+
+    def signals(self, user_ids: np.ndarray, joined_at: np.ndarray, now: float | None = None) -> dict[str, np.ndarray]:
+        """Compute the suspicious signals of a batch of joining members.
+
+        Args:
+            user_ids (np.ndarray): The IDs of the members.
+            joined_at (np.ndarray): When each member joined, in seconds since the unix epoch.
+            now (float | None, optional): The current time in seconds since the unix epoch. Defaults to now.
+
+        Returns:
+            dict[str, np.ndarray]: For each signal, if each member is suspicious, as bool.
+        """
+        features = self.features(user_ids, joined_at, now)
+        return {
+            "young_account": features.join_delta < self.join_delta_threshold,
+            "clustered_creation": features.creation_cluster >= self.cluster_size,
+        }
+
+    def score(self, user_ids: np.ndarray, joined_at: np.ndarray, now: float | None = None) -> np.ndarray:
+        """Score a batch of joining members.
+
+        Args:
+            user_ids (np.ndarray): The IDs of the members.
+            joined_at (np.ndarray): When each member joined, in seconds since the unix epoch.
+            now (float | None, optional): The current time in seconds since the unix epoch. Defaults to now.
+
+        Returns:
+            np.ndarray: The score of each member, as float64.
+        """
+        signals = self.signals(user_ids, joined_at, now)
+        return sum(self.weights[name] * values for name, values in signals.items())  # type: ignore
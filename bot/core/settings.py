@@ -0,0 +1,335 @@
+import sys
+from array import array
+from typing import Iterator
+
+import asyncpg
+from core.models import GuildConfig, JoinGuardConfig
+
+# Bits of the flags column
+_IS_ENABLED = 1 << 0
+_RAID_MODE = 1 << 1
+_JOIN_DELTA = 1 << 2
+_NITRO = 1 << 3
+_MOBILE = 1 << 4
+_DM_LOCKED = 1 << 5
+_SETUP_COMPLETE = 1 << 6
+_USE_VANITY_INVITE = 1 << 7
+# nitro, mobile and dm_locked are nullable, so they have an extra bit for None
+_NITRO_IS_NONE = 1 << 8
+_MOBILE_IS_NONE = 1 << 9
+_DM_LOCKED_IS_NONE = 1 << 10
+# A guild can have a row in `guilds` without having one in `join_guard`
+_HAS_GUILD_CONFIG = 1 << 11
+_HAS_JOIN_GUARD_CONFIG = 1 << 12
+# Set when the database has no `join_guard` row for the guild, so the misses are not looked up again
+_NO_JOIN_GUARD_CONFIG = 1 << 13
+
+_NULLABLE_BITS = {_NITRO: _NITRO_IS_NONE, _MOBILE: _MOBILE_IS_NONE, _DM_LOCKED: _DM_LOCKED_IS_NONE}
+
+
+def _flag(bit: int) -> property:
+    none_bit = _NULLABLE_BITS.get(bit, 0)
+
+    def getter(self: "_SettingsView") -> bool | None:
+        flags = self._table._flags[self._row]
+        if flags & none_bit:
+            return None
+        return bool(flags & bit)
+
+    def setter(self: "_SettingsView", value: bool | None) -> None:
+        row = self._row
+        flags = self._table._flags[row] & ~(bit | none_bit)
+        if value is None:
+            if not none_bit:
+                raise ValueError("This setting cannot be None.")
+            flags |= none_bit
+        elif value:
+            flags |= bit
+        self._table._flags[row] = flags
+
+    return property(getter, setter)
+
+
+def _column(name: str, nullable: bool = True) -> property:
+    # 0 is never a valid snowflake, so it is used to store None in the id columns
+    def getter(self: "_SettingsView") -> int | str | None:
+        value = getattr(self._table, name)[self._row]
+        if nullable and value == 0:
+            return None
+        return value
+
+    def setter(self: "_SettingsView", value: int | str | None) -> None:
+        if isinstance(value, str):
+            value = sys.intern(value)
+        getattr(self._table, name)[self._row] = 0 if value is None else value
+
+    return property(getter, setter)
+
+
+class _SettingsView:
+    __slots__ = ("_table", "guild_id")
+
+    def __init__(self, table: "GuildSettingsTable", guild_id: int) -> None:
+        self._table = table
+        self.guild_id = guild_id
+
+    @property
+    def _row(self) -> int:
+        # Rows move when other guilds are removed, so always resolve it by the guild id
+        return self._table._rows[self.guild_id]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{self.__class__.__name__}({fields})"
+
+    _fields: tuple[str, ...] = ()
+
+
+class GuildConfigView(_SettingsView):
+    """A view of a row of the `GuildSettingsTable` with the same attributes as `GuildConfig`."""
+
+    __slots__ = ()
+    _fields = (
+        "guild_id",
+        "locale",
+        "use_vanity_invite",
+        "custom_invite_code",
+        "entry_log_channel_id",
+        "verification_log_channel_id",
+        "setup_complete",
+    )
+
+    locale = _column("_locales")
+    use_vanity_invite = _flag(_USE_VANITY_INVITE)
+    custom_invite_code = _column("_custom_invite_codes")
+    entry_log_channel_id = _column("_entry_log_channel_ids")
+    verification_log_channel_id = _column("_verification_log_channel_ids")
+    setup_complete = _flag(_SETUP_COMPLETE)
+
+    def to_config(self) -> GuildConfig:
+        """Copy the view into a `GuildConfig`.
+
+        Returns:
+            GuildConfig: The guild config.
+        """
+        return GuildConfig(**{name: getattr(self, name) for name in self._fields})
+
+
+class JoinGuardConfigView(_SettingsView):
+    """A view of a row of the `GuildSettingsTable` with the same attributes as `JoinGuardConfig`."""
+
+    __slots__ = ()
+    _fields = (
+        "guild_id",
+        "is_enabled",
+        "raid_mode",
+        "join_delta",
+        "join_delta_threshold",
+        "nitro",
+        "mobile",
+        "dm_locked",
+    )
+
+    is_enabled = _flag(_IS_ENABLED)
+    raid_mode = _flag(_RAID_MODE)
+    join_delta = _flag(_JOIN_DELTA)
+    join_delta_threshold = _column("_join_delta_thresholds", nullable=False)
+    nitro = _flag(_NITRO)
+    mobile = _flag(_MOBILE)
+    dm_locked = _flag(_DM_LOCKED)
+
+    def to_config(self) -> JoinGuardConfig:
+        """Copy the view into a `JoinGuardConfig`.
+
+        Returns:
+            JoinGuardConfig: The join guard config.
+        """
+        return JoinGuardConfig(**{name: getattr(self, name) for name in self._fields})
+
+
+class GuildSettingsTable:
+    """A compact in-memory table of the settings of every guild.
+
+    The boolean settings of a guild are packed in a single integer and the numeric
+    ones are stored in typed arrays, one row per guild, so keeping the settings of a
+    large number of guilds in memory costs a few dozen bytes per guild instead of two
+    dataclass instances full of boxed values.
+    Rows are accessed through `GuildConfigView` and `JoinGuardConfigView`, which expose
+    the same attributes as `GuildConfig` and `JoinGuardConfig`.
+    """
+
+    def __init__(self) -> None:
+        self._rows: dict[int, int] = {}
+        self._guild_ids = array("q")
+        self._flags = array("H")
+        self._join_delta_thresholds = array("i")
+        self._entry_log_channel_ids = array("q")
+        self._verification_log_channel_ids = array("q")
+        # Strings can't be stored in arrays, locales are interned and invite codes are mostly None
+        self._locales: list[str | int] = []
+        self._custom_invite_codes: list[str | int] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._rows)
+
+    def _get_or_create_row(self, guild_id: int) -> int:
+        row = self._rows.get(guild_id)
+        if row is not None:
+            return row
+
+        row = self._rows[guild_id] = len(self._guild_ids)
+        self._guild_ids.append(guild_id)
+        self._flags.append(_JOIN_DELTA)
+        self._join_delta_thresholds.append(0)
+        self._entry_log_channel_ids.append(0)
+        self._verification_log_channel_ids.append(0)
+        self._locales.append(0)
+        self._custom_invite_codes.append(0)
+        return row
+
+    def put_guild_config(self, config: GuildConfig | GuildConfigView) -> GuildConfigView:
+        """Insert or replace the guild config of a guild.
+
+        Args:
+            config (GuildConfig | GuildConfigView): The guild config to store.
+
+        Returns:
+            GuildConfigView: A view of the stored guild config.
+        """
+        row = self._get_or_create_row(config.guild_id)
+        self._flags[row] |= _HAS_GUILD_CONFIG
+        view = GuildConfigView(self, config.guild_id)
+        for name in GuildConfigView._fields[1:]:
+            setattr(view, name, getattr(config, name))
+        return view
+
+    def put_join_guard_config(self, config: JoinGuardConfig | JoinGuardConfigView) -> JoinGuardConfigView:
+        """Insert or replace the join guard config of a guild.
+
+        Args:
+            config (JoinGuardConfig | JoinGuardConfigView): The join guard config to store.
+
+        Returns:
+            JoinGuardConfigView: A view of the stored join guard config.
+        """
+        row = self._get_or_create_row(config.guild_id)
+        self._flags[row] = self._flags[row] & ~_NO_JOIN_GUARD_CONFIG | _HAS_JOIN_GUARD_CONFIG
+        view = JoinGuardConfigView(self, config.guild_id)
+        for name in JoinGuardConfigView._fields[1:]:
+            setattr(view, name, getattr(config, name))
+        return view
+
+    def put_missing_join_guard_config(self, guild_id: int) -> None:
+        """Remember that a guild has no join guard config in the database, until one is put.
+
+        Args:
+            guild_id (int): The guild ID without a join guard config.
+        """
+        row = self._get_or_create_row(guild_id)
+        self._flags[row] = self._flags[row] & ~_HAS_JOIN_GUARD_CONFIG | _NO_JOIN_GUARD_CONFIG
+
+    def join_guard_config_missing(self, guild_id: int) -> bool:
+        """Check if a guild is known to have no join guard config in the database.
+
+        Args:
+            guild_id (int): The guild ID to search for.
+
+        Returns:
+            bool: True if `put_missing_join_guard_config` was called for the guild, or it was loaded without one.
+        """
+        row = self._rows.get(guild_id)
+        return row is not None and bool(self._flags[row] & _NO_JOIN_GUARD_CONFIG)
+
+    def guild_config(self, guild_id: int) -> GuildConfigView | None:
+        """Get the guild config of a guild.
+
+        Args:
+            guild_id (int): The guild ID to search for.
+
+        Returns:
+            GuildConfigView | None: A view of the guild config or None if not stored.
+        """
+        row = self._rows.get(guild_id)
+        if row is None or not self._flags[row] & _HAS_GUILD_CONFIG:
+            return None
+        return GuildConfigView(self, guild_id)
+
+    def join_guard_config(self, guild_id: int) -> JoinGuardConfigView | None:
+        """Get the join guard config of a guild.
+
+        Args:
+            guild_id (int): The guild ID to search for.
+
+        Returns:
+            JoinGuardConfigView | None: A view of the join guard config or None if not stored.
+        """
+        row = self._rows.get(guild_id)
+        if row is None or not self._flags[row] & _HAS_JOIN_GUARD_CONFIG:
+            return None
+        return JoinGuardConfigView(self, guild_id)
+
+    def remove(self, guild_id: int) -> None:
+        """Remove every setting of a guild from the table.
+        The last row is moved into the removed one, so the columns stay dense.
+
+        Args:
+            guild_id (int): The guild ID to remove.
+        """
+        row = self._rows.pop(guild_id, None)
+        if row is None:
+            return
+
+        columns = self._columns()
+        last = len(self._guild_ids) - 1
+        if row != last:
+            for column in columns:
+                column[row] = column[last]
+            self._rows[self._guild_ids[row]] = row
+        for column in columns:
+            del column[last]
+
+    def _columns(self) -> tuple[array | list, ...]:
+        return (
+            self._guild_ids,
+            self._flags,
+            self._join_delta_thresholds,
+            self._entry_log_channel_ids,
+            self._verification_log_channel_ids,
+            self._locales,
+            self._custom_invite_codes,
+        )
+
+    def nbytes(self) -> int:
+        """Get the approximate amount of memory used by the table.
+        Interned strings are shared with the rest of the process, so they are not counted.
+
+        Returns:
+            int: The size of the columns and the index in bytes.
+        """
+        return sys.getsizeof(self._rows) + sum(sys.getsizeof(column) for column in self._columns())
+
+    async def load(self, pool: asyncpg.Pool) -> int:
+        """Load the settings of every guild the bot is still in from the database into the table.
+
+        Args:
+            pool (asyncpg.Pool): The database connection pool.
+
+        Returns:
+            int: How many guilds are in the table after loading.
+        """
+        async with pool.acquire() as connection:
+            for record in await connection.fetch("SELECT * FROM guilds WHERE left_at IS NULL"):
+                self.put_guild_config(GuildConfig.from_record(record))
+            query = "SELECT join_guard.* FROM join_guard JOIN guilds USING (guild_id) WHERE guilds.left_at IS NULL"
+            for record in await connection.fetch(query):
+                self.put_join_guard_config(JoinGuardConfig.from_record(record))
+        for guild_id, row in self._rows.items():
+            if not self._flags[row] & _HAS_JOIN_GUARD_CONFIG:
+                self._flags[row] |= _NO_JOIN_GUARD_CONFIG
+        return len(self)
@@ -0,0 +1,173 @@
+import random
+import time
+import unicodedata
+import zlib
+from collections import deque
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def normalize_username(name: str) -> str:
+    """Normalize an username so templated names look the same.
+    Accents and separators are removed, the name is lowercased and every run of digits becomes a single "#".
+
+    Examples:
+        >>> normalize_username("Jöhn_Doe1234")
+        "johndoe#"
+    """
+    name = unicodedata.normalize("NFKD", name)
+    normalized = []
+    for char in name.lower():
+        if unicodedata.combining(char) or char in "._-":
+            continue
+        if char.isdigit():
+            if normalized and normalized[-1] == "#":
+                continue
+            char = "#"
+        normalized.append(char)
+    return "".join(normalized)
+
+
+def shingles(name: str, size: int = 3) -> set[str]:
+    """Get the character n-grams of a normalized name, with the start and end marked."""
+    name = f"^{name}$"
+    if len(name) <= size:
+        return {name}
+    return {name[index : index + size] for index in range(len(name) - size + 1)}
+
+
+class MinHasher:
+    """Computes MinHash signatures of names and splits them in bands for locality sensitive hashing.
+
+    Two names with a Jaccard similarity of `s` between their shingles share at least one band
+    with a probability of `1 - (1 - s ** rows) ** bands`.
+    """
+
+    def __init__(self, bands: int = 8, rows: int = 2, seed: int = 0) -> None:
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)
+        permutations = bands * rows
+        # a * hash + b stays below 2 ** 63, so it doesn't overflow
+        self._a = np.array([rng.randrange(1, _MERSENNE_PRIME) for _ in range(permutations)], dtype=np.uint64)
+        self._b = np.array([rng.randrange(0, _MERSENNE_PRIME) for _ in range(permutations)], dtype=np.uint64)
+
+    def signature(self, name: str) -> list[int]:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingles(normalize_username(name))), dtype=np.uint64
+        )
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1).tolist()
+
+    def band_keys(self, name: str) -> tuple[int, ...]:
+        """Get one hashable key per band of the signature of a name."""
+        signature = self.signature(name)
+        rows = self.rows
+        return tuple(hash((band, *signature[band * rows : (band + 1) * rows])) for band in range(self.bands))
+
+
+class RecentNamesIndex:
+    """An index of the names of the members that recently joined a guild.
+
+    Only how many names fall in each LSH bucket is kept, so answering how many recent
+    joiners look like a name only takes one lookup per band, no matter how many names
+    are in the index. Names older than `window` seconds are evicted, and at most
+    `max_entries` names are kept.
+    """
+
+    def __init__(self, hasher: MinHasher, window: float = 600.0, max_entries: int = 10_000) -> None:
+        self.hasher = hasher
+        self.window = window
+        self.max_entries = max_entries
+        self._entries: deque[tuple[float, tuple[int, ...]]] = deque()
+        self._buckets: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.window
+        entries = self._entries
+        while entries and (entries[0][0] < cutoff or len(entries) > self.max_entries):
+            _, keys = entries.popleft()
+            for key in keys:
+                count = self._buckets[key] - 1
+                if count:
+                    self._buckets[key] = count
+                else:
+                    del self._buckets[key]
+
+    def _count(self, keys: tuple[int, ...]) -> int:
+        return max(self._buckets.get(key, 0) for key in keys)
+
+    def count_similar(self, name: str, now: float | None = None) -> int:
+        """Count how many names in the index look like a name.
+
+        Notes:
+            This is the size of the largest bucket the name falls in, so it is a lower bound
+            of the names that share at least one band with it.
+
+        Args:
+            name (str): The name to look for.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            int: How many similar names are in the index.
+        """
+        self._evict(time.monotonic() if now is None else now)
+        return self._count(self.hasher.band_keys(name))
+
+    def add(self, name: str, now: float | None = None) -> int:
+        """Add a name to the index.
+
+        Args:
+            name (str): The name to add.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            int: How many similar names were already in the index.
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        keys = self.hasher.band_keys(name)
+        similar = self._count(keys)
+        self._entries.append((now, keys))
+        for key in keys:
+            self._buckets[key] = self._buckets.get(key, 0) + 1
+        self._evict(now)
+        return similar
+
+
+class UsernameSimilarity:
+    """Keeps a `RecentNamesIndex` for every guild with recent joins."""
+
+    def __init__(self, window: float = 600.0, max_entries_per_guild: int = 10_000) -> None:
+        self.window = window
+        self.max_entries_per_guild = max_entries_per_guild
+        self.hasher = MinHasher()
+        self._indexes: dict[int, RecentNamesIndex] = {}
+
+    def add(self, guild_id: int, name: str, now: float | None = None) -> int:
+        """Add the name of a member that joined a guild.
+
+        Args:
+            guild_id (int): The guild the member joined.
+            name (str): The name of the member.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            int: How many recent joiners of the guild have a similar name.
+        """
+        index = self._indexes.get(guild_id)
+        if index is None:
+            index = self._indexes[guild_id] = RecentNamesIndex(self.hasher, self.window, self.max_entries_per_guild)
+        return index.add(name, now)
+
+    def prune(self, now: float | None = None) -> None:
+        """Drop the indexes of the guilds without recent joins."""
+        now = time.monotonic() if now is None else now
+        for guild_id, index in list(self._indexes.items()):
+            index._evict(now)
+            if not index:
+                del self._indexes[guild_id]
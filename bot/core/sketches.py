@@ -0,0 +1,115 @@
+import hashlib
+import time
+
+import numpy as np
+
+
+class WindowedCountMinSketch:
+    """A count-min sketch of the keys seen in the last `slots * slot_seconds` seconds.
+
+    The window is split in slots, each one with its own sketch, and the oldest slot
+    is cleared when time moves past it. The memory used only depends on the
+    dimensions of the sketch, not on how many keys are added.
+    Estimates can be higher than the real counts, but never lower.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4, slots: int = 12, slot_seconds: float = 300.0) -> None:
+        if depth > 8:
+            raise ValueError("The depth of the sketch can't be greater than 8.")
+        self.width = width
+        self.depth = depth
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+        self._counts = np.zeros((slots, depth, width), dtype=np.uint32)
+        self._rows = np.arange(depth)
+        self._first_slot: int | None = None
+        self._current_slot: int | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return self._counts.nbytes
+
+    def _columns(self, key: str) -> np.ndarray:
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        return np.frombuffer(digest, dtype=np.uint32) % self.width
+
+    def _advance(self, now: float) -> int:
+        slot = int(now // self.slot_seconds)
+        if self._current_slot is None:
+            self._first_slot = self._current_slot = slot
+        # Clear every slot that was skipped since the last call, at most the whole window
+        for expired in range(self._current_slot + 1, min(slot, self._current_slot + self.slots) + 1):
+            self._counts[expired % self.slots] = 0
+        self._current_slot = max(slot, self._current_slot)
+        return self._current_slot % self.slots
+
+    def add(self, key: str, now: float | None = None) -> None:
+        """Count a key.
+
+        Args:
+            key (str): The key to count.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+        """
+        slot = self._advance(time.monotonic() if now is None else now)
+        self._counts[slot, self._rows, self._columns(key)] += 1
+
+    def estimate(self, key: str, now: float | None = None) -> tuple[int, int]:
+        """Estimate how many times a key was counted.
+
+        Args:
+            key (str): The key to estimate.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            tuple[int, int]: The count in the current slot and the count in the whole window.
+        """
+        slot = self._advance(time.monotonic() if now is None else now)
+        counts = self._counts[:, self._rows, self._columns(key)]
+        return int(counts[slot].min()), int(counts.sum(axis=0).min())
+
+    def previous_slots(self, now: float | None = None) -> int:
+        """Get how many of the slots before the current one were counted since the sketch was created.
+
+        Args:
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            int: The number of previous slots, up to `slots - 1` once the window is full.
+        """
+        self._advance(time.monotonic() if now is None else now)
+        return min(self._current_slot - self._first_slot, self.slots - 1)  # type: ignore
+
+
+class AvatarFrequencyTracker:
+    """Tracks how often each avatar is seen on joining members, across every guild.
+
+    An avatar is spiking when it was seen at least `min_count` times in the current slot,
+    and at least `factor` times more than the average of the previous slots. The average
+    only covers the slots counted since the tracker was created, so the empty slots left
+    by a restart don't lower it. Members without an avatar all share the default avatar,
+    so they are never flagged.
+    """
+
+    def __init__(self, sketch: WindowedCountMinSketch | None = None, min_count: int = 5, factor: float = 3.0) -> None:
+        self.sketch = sketch or WindowedCountMinSketch()
+        self.min_count = min_count
+        self.factor = factor
+
+    def observe(self, avatar_key: str | None, now: float | None = None) -> bool:
+        """Count an avatar and check if it is spiking.
+
+        Args:
+            avatar_key (str | None): The avatar hash, None for members without an avatar.
+            now (float | None, optional): The current monotonic time. Defaults to time.monotonic().
+
+        Returns:
+            bool: True if the avatar is spiking, False otherwise.
+        """
+        if avatar_key is None:
+            return False
+        now = time.monotonic() if now is None else now
+        self.sketch.add(avatar_key, now)
+        current, window = self.sketch.estimate(avatar_key, now)
+        previous_slots = self.sketch.previous_slots(now)
+        baseline = (window - current) / previous_slots if previous_slots else 0.0
+        return current >= self.min_count and current >= self.factor * max(baseline, 1.0)
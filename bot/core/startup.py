@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from core.metrics import metrics
+from loguru import logger
+
+
+class StartupTimeline:
+    """Records how long each phase of the bot startup took.
+
+    Every finished phase is also exported as a `startup.<phase>.seconds` gauge. Phases
+    marked as concurrent ran alongside others, so their durations are wall-clock times
+    that overlap and don't add up to the total.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self.finished_at: float | None = None
+        self.phases: dict[str, float] = {}
+        self._running: dict[str, float] = {}
+        self._concurrent: set[str] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def start(self, name: str, concurrent: bool = False) -> None:
+        """Start timing a phase.
+
+        Args:
+            name (str): The name of the phase.
+            concurrent (bool): Whether the phase runs alongside other phases.
+        """
+        self._running[name] = time.perf_counter()
+        if concurrent:
+            self._concurrent.add(name)
+
+    def end(self, name: str) -> None:
+        """Stop timing a phase. Phases that were not started are ignored.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        started_at = self._running.pop(name, None)
+        if started_at is None:
+            return
+        duration = self.phases[name] = time.perf_counter() - started_at
+        metrics.gauge(f"startup.{name}.seconds", f"How long the {name} startup phase took.").set(duration)
+
+    @contextmanager
+    def phase(self, name: str, concurrent: bool = False) -> Iterator[None]:
+        """Time the code inside the `with` block as a phase.
+
+        Args:
+            name (str): The name of the phase.
+            concurrent (bool): Whether the phase runs alongside other phases.
+        """
+        self.start(name, concurrent)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def finish(self) -> None:
+        """Mark the startup as finished and log the timeline."""
+        self.finished_at = time.perf_counter()
+        metrics.gauge("startup.total.seconds", "How long the whole startup took.").set(self.total)
+        logger.info(f"Startup finished in {self.total:.3f}s\n{self.report()}")
+
+    @property
+    def total(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def report(self) -> str:
+        """Format the duration of every phase, in the order they finished.
+
+        Returns:
+            str: One line per phase.
+        """
+        width = max(map(len, self.phases), default=0)
+        return "\n".join(
+            f"{name:<{width}} {duration:8.3f}s{' (wall clock, concurrent)' if name in self._concurrent else ''}"
+            for name, duration in self.phases.items()
+        )
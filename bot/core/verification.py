@@ -0,0 +1,210 @@
+import datetime
+import hashlib
+import hmac
+import html
+import secrets
+from dataclasses import dataclass
+
+import jwt
+from aiohttp import web
+from loguru import logger
+
+ALGORITHM = "HS256"
+# The kind of the outbox messages that send the verification DM to a flagged member
+VERIFICATION_DM = "verification_dm"
+
+
+class InvalidVerificationToken(Exception):
+    """Raised when a verification token is invalid or expired."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class VerificationClaims:
+    """What a verification token proves: which user has to pass which challenge to get back into which guild."""
+
+    guild_id: int
+    user_id: int
+    challenge: str
+    invite_code: str | None = None
+
+
+class VerificationTokens:
+    """Issues and checks signed verification tokens.
+
+    Everything needed to complete a verification is inside the token, so checking
+    one doesn't need the database or any state kept by the bot process.
+    """
+
+    def __init__(self, secret: str, ttl: int = 3600) -> None:
+        """Initializes the token issuer
+
+        Args:
+            secret (str): The secret used to sign the tokens.
+            ttl (int, optional): For how many seconds a token is valid. Defaults to one hour.
+        """
+        self._secret = secret
+        self.ttl = ttl
+
+    def issue(self, guild_id: int, user_id: int, invite_code: str | None = None) -> str:
+        """Issue a token for a user to verify in a guild.
+
+        Args:
+            guild_id (int): The guild the user is verifying for.
+            user_id (int): The user that has to verify.
+            invite_code (str | None, optional): The invite the user is sent to after verifying.
+
+        Returns:
+            str: The signed token.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        payload = {
+            # Snowflakes are sent as strings, like discord does, since they don't fit in a JS number
+            "gid": str(guild_id),
+            "uid": str(user_id),
+            "chl": secrets.token_urlsafe(12),
+            "iat": now,
+            "exp": now + datetime.timedelta(seconds=self.ttl),
+        }
+        if invite_code is not None:
+            payload["inv"] = invite_code
+        return jwt.encode(payload, self._secret, algorithm=ALGORITHM)
+
+    def verify(self, token: str) -> VerificationClaims:
+        """Check a token and get its claims.
+
+        Args:
+            token (str): The token to check.
+
+        Returns:
+            VerificationClaims: The claims of the token.
+
+        Raises:
+            InvalidVerificationToken: If the token is invalid or expired.
+        """
+        try:
+            payload = jwt.decode(
+                token, self._secret, algorithms=[ALGORITHM], options={"require": ["exp", "gid", "uid", "chl"]}
+            )
+            return VerificationClaims(
+                guild_id=int(payload["gid"]),
+                user_id=int(payload["uid"]),
+                challenge=payload["chl"],
+                invite_code=payload.get("inv"),
+            )
+        except (jwt.PyJWTError, ValueError, TypeError) as e:
+            raise InvalidVerificationToken(str(e)) from e
+
+    def question(self, claims: VerificationClaims) -> tuple[int, int]:
+        """Get the two numbers the user has to add up to pass the challenge of a token.
+
+        They are derived from the challenge and the secret, so the answer is not in the token
+        and checking it doesn't need any state either.
+
+        Args:
+            claims (VerificationClaims): The claims of the token.
+
+        Returns:
+            tuple[int, int]: The numbers to add up.
+        """
+        digest = hmac.new(self._secret.encode(), claims.challenge.encode(), hashlib.sha256).digest()
+        return 2 + digest[0] % 19, 2 + digest[1] % 19
+
+    def check_answer(self, claims: VerificationClaims, answer: str) -> bool:
+        """Check the answer to the challenge of a token.
+
+        Args:
+            claims (VerificationClaims): The claims of the token.
+            answer (str): The answer of the user.
+
+        Returns:
+            bool: True if the answer is correct.
+        """
+        try:
+            return int(answer.strip()) == sum(self.question(claims))
+        except ValueError:
+            return False
+
+
+_CHALLENGE_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><meta name="viewport" content="width=device-width"><title>Verification</title></head>
+<body>
+<form method="post">
+<p>{error}</p>
+<label>How much is {a} + {b}? <input name="answer" inputmode="numeric" autocomplete="off" required></label>
+<button type="submit">Verify</button>
+</form>
+</body>
+</html>
+"""
+
+
+class VerificationServer:
+    """A small HTTP server that completes verifications from the links sent to the users.
+
+    Opening a link only shows its challenge, so link previews and mail scanners that fetch
+    it don't verify anyone. The verification is completed when the answer is posted.
+    """
+
+    def __init__(self, tokens: VerificationTokens, on_verified, host: str, port: int) -> None:
+        """Initializes the server
+
+        Args:
+            tokens (VerificationTokens): Used to check the tokens of the links.
+            on_verified (Callable[[VerificationClaims], Awaitable[None]]): Called with the claims of
+                every token whose challenge was answered correctly.
+            host (str): The host to listen on.
+            port (int): The port to listen on.
+        """
+        self.tokens = tokens
+        self.on_verified = on_verified
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    def _build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/verify/{token}", self.challenge)
+        app.router.add_post("/verify/{token}", self.verify)
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self._build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Verification server listening on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _render_challenge(self, claims: VerificationClaims, error: str = "", status: int = 200) -> web.Response:
+        a, b = self.tokens.question(claims)
+        page = _CHALLENGE_PAGE.format(error=html.escape(error), a=a, b=b)
+        return web.Response(status=status, text=page, content_type="text/html")
+
+    async def challenge(self, request: web.Request) -> web.StreamResponse:
+        try:
+            claims = self.tokens.verify(request.match_info["token"])
+        except InvalidVerificationToken:
+            return web.Response(status=400, text="This verification link is invalid or has expired.")
+        return self._render_challenge(claims)
+
+    async def verify(self, request: web.Request) -> web.StreamResponse:
+        try:
+            claims = self.tokens.verify(request.match_info["token"])
+        except InvalidVerificationToken:
+            return web.Response(status=400, text="This verification link is invalid or has expired.")
+
+        form = await request.post()
+        answer = form.get("answer")
+        if not isinstance(answer, str) or not self.tokens.check_answer(claims, answer):
+            return self._render_challenge(claims, "That answer is not correct, try again.", status=400)
+
+        await self.on_verified(claims)
+        if claims.invite_code:
+            raise web.HTTPFound(f"https://discord.gg/{claims.invite_code}")
+        return web.Response(text="You have been verified, the join guard of the server won't flag you again.")
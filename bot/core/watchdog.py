@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+
+from core.metrics import metrics
+from loguru import logger
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _capture_stack(frame: FrameType | None) -> list[traceback.FrameSummary]:
+    """Capture the code and line of each frame, innermost last.
+
+    The frames belong to the loop thread, which keeps running them, so only their code and line
+    are read here. Their locals are left alone and the source lines are loaded later.
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(traceback.FrameSummary(code.co_filename, frame.f_lineno, code.co_name, lookup_line=False))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _find_handler(stack: list[traceback.FrameSummary]) -> str | None:
+    """Find the innermost function of a cog in a captured stack, usually the command or listener that blocked."""
+    for summary in reversed(stack):
+        if f"{os.sep}cogs{os.sep}" in summary.filename:
+            return f"{summary.name} in {os.path.basename(summary.filename)}"
+    return None
+
+
+class LoopLagWatchdog:
+    """Measure how late the event loop runs a callback, and find out what blocked it.
+
+    A task sleeps for `interval` in a loop, and how much later than that it wakes up is
+    the lag, exported in the `event_loop_lag.seconds` histogram. A helper thread checks
+    that the task keeps waking up, and when it doesn't for more than `threshold`, it
+    captures the stack of the loop thread while the blocking callback is still running.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25) -> None:
+        self.interval = interval
+        self.threshold = threshold
+
+        self._lag = metrics.histogram("event_loop_lag.seconds", "How late the event loop ran a callback.", LAG_BUCKETS)
+        self._blocked = metrics.counter("event_loop_blocked", "Times a callback blocked the event loop for too long.")
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._last_tick = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start measuring the lag of the running loop. Must be called from the event loop thread."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="loop-lag-watchdog")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+
+    async def close(self) -> None:
+        """Stop the task and the helper thread."""
+        self._stop.set()
+        if self._thread is not None:
+            # The thread wakes up every threshold / 2, don't block the loop while waiting for it
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._last_tick = now = time.monotonic()
+            self._lag.observe(max(0.0, now - start - self.interval))
+
+    def _watch(self) -> None:
+        reported_tick = None
+        while not self._stop.wait(self.threshold / 2):
+            last_tick = self._last_tick
+            blocked_for = time.monotonic() - last_tick - self.interval
+            if blocked_for < self.threshold or reported_tick == last_tick:
+                continue
+            # Only report once per blocking callback
+            reported_tick = last_tick
+            self._report(blocked_for)
+
+    def _report(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+        if frame is None:
+            return
+        captured = _capture_stack(frame)
+        del frame
+        self._blocked.inc()
+        task = asyncio.current_task(self._loop)
+        # The listeners are run in tasks named after their event by discord.py
+        source = _find_handler(captured) or (task.get_name() if task is not None else "a callback outside of a task")
+        stack = "".join(traceback.format_list(captured))
+        logger.warning(f"The event loop has been blocked for {blocked_for:.3f}s by {source}:\n{stack}")
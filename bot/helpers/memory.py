@@ -0,0 +1,61 @@
+import resource
+import sys
+
+import discord
+
+
+def get_rss() -> int:
+    """Get the resident set size of the current process.
+
+    Notes:
+        Falls back to the peak resident set size on systems without /proc.
+
+    Returns:
+        int: The resident set size in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _sizeof_member(member: discord.Member) -> int:
+    size = sys.getsizeof(member) + sys.getsizeof(member._user) + sys.getsizeof(member._roles)
+    if member.activities:
+        size += sys.getsizeof(member.activities)
+    return size
+
+
+def estimate_guild_footprint(guild: discord.Guild) -> int:
+    """Estimate how much memory the cached state of a guild uses.
+    Only the members, channels, threads and roles are taken into account.
+
+    Args:
+        guild (discord.Guild): The guild to estimate.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    size = sys.getsizeof(guild)
+    size += sum(_sizeof_member(member) for member in guild.members)
+    size += sum(sys.getsizeof(channel) for channel in guild.channels)
+    size += sum(sys.getsizeof(thread) for thread in guild.threads)
+    size += sum(sys.getsizeof(role) for role in guild.roles)
+    return size
+
+
+def format_bytes(size: int | float) -> str:
+    """Format a size in bytes to a human readable string.
+
+    Examples:
+        >>> format_bytes(2048)
+        "2.0 KiB"
+    """
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
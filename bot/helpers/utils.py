@@ -37,10 +37,10 @@ class ProgressBar:
         self.total = total
         self.bar_length = bar_length
         self.current_value = 0
-        self.full_char = "▰"
-        self.empty_char = "▱"
-        self.start_char = "["
-        self.end_char = "]"
+        self.full_char = full_char
+        self.empty_char = empty_char
+        self.start_char = start_char
+        self.end_char = end_char
 
     @property
     def bar(self):
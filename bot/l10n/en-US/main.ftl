@@ -67,8 +67,8 @@ setup_invite_view =
     .title = Select an invite for the Join Guard
     .description =
     The Join Guard is a verification system designed to prevent potential self-bots from joining your guild. Upon joining, each user will be checked against certain requirements.
-    If they do not meet the requirements, the bot will send them a message asking them to complete a verification process and then kick them from the guild.
-    Once the user successfully completes the verification process, they will be redirected back to the guild using a selected invite.
+    If they do not meet the requirements, the bot will flag them and send them a message asking them to complete a verification process.
+    Once the user successfully completes the verification process, they won't be flagged again and are sent back to the guild using the selected invite.
 
     { $info }
     .info_vanity_invite = You can choose to use the guild's existing vanity invite ({ $invite_url }) or generate a new invite to be used by the Join Guard.
@@ -106,6 +106,8 @@ setup_already_done =
     .description = The setup has already been completed for this guild, if you want to run it again, click "Continue".
     .footer = Click "Continue" to run the setup again.
 
+setup_not_allowed = You need the Manage Server permission to run the setup.
+
 # Name of the discord permissions (has to be the same as the ones in the discord client)
 permissions = Permissions
     .kick_members = Kick members
@@ -115,4 +117,44 @@ permissions = Permissions
     .send_messages = Send messages
     .send_messages_in_threads = Send messages in threads
     .use_external_emojis = Use external emojis
-    .add_reactions = Add reactions
\ No newline at end of file
+    .add_reactions = Add reactions
+
+join_stats_embed =
+    .title = Join statistics
+    .last_hour = Last hour
+    .last_day = Last 24 hours
+    .value =
+    Joins: { $joins }
+    Flagged: { $flagged }
+
+verification_dm =
+    .title = Verification required
+    .description =
+    To keep { $guild } safe from bots, your account was flagged when it joined and needs to be verified.
+
+    Click "Verify" below or open the verification link, then answer the question to complete the verification.
+    .confirm_button = Verify
+    .link_button = Open verification link
+    .modal_title = Verification
+    .question = How much is { $a } + { $b }?
+    .wrong_answer = That answer is not correct, click "Verify" to try again.
+    .verified = You have been verified! Your account won't be flagged in this guild anymore. { $invite }
+    .invalid = This verification is invalid or has expired.
+
+raid_dashboard =
+    .title = Raid in progress
+    .title_ended = Raid over
+    .description = Started { $started }
+    .joins = Joins
+    .checked = Checked
+    .flagged = Flagged
+    .queue = Waiting in queue
+
+## Application commands, see core.l10n.Translator for how the IDs are built
+
+command-setup =
+    .name = setup
+    .description = Set up the bot in this server
+command-stats =
+    .name = stats
+    .description = Show how many members joined and were flagged recently
@@ -43,6 +43,7 @@ setup_permissions_embed =
     .footer_has_permissions = Clique em "Continuar" para continuar.
 
 setup_cancel_button_pressed = A configuração foi cancelada.
+setup_not_allowed = Você precisa da permissão Gerenciar servidor para fazer a configuração.
 
 permissions = Permissões
     .kick_members = Expulsar membros
@@ -53,3 +54,43 @@ permissions = Permissões
     .send_messages_in_threads = Enviar mensagens em tópicos
     .use_external_emojis = Usar emojis externos
     .add_reactions = Adicionar reações
+
+join_stats_embed =
+    .title = Estatísticas de entrada
+    .last_hour = Última hora
+    .last_day = Últimas 24 horas
+    .value =
+    Entradas: { $joins }
+    Sinalizados: { $flagged }
+
+verification_dm =
+    .title = Verificação necessária
+    .description =
+    Para manter { $guild } protegido contra bots, sua conta foi sinalizada ao entrar e precisa ser verificada.
+
+    Clique em "Verificar" abaixo ou abra o link de verificação e responda à pergunta para completar a verificação.
+    .confirm_button = Verificar
+    .link_button = Abrir link de verificação
+    .modal_title = Verificação
+    .question = Quanto é { $a } + { $b }?
+    .wrong_answer = Essa resposta não está correta, clique em "Verificar" para tentar novamente.
+    .verified = Você foi verificado! Sua conta não será mais sinalizada neste servidor. { $invite }
+    .invalid = Esta verificação é inválida ou expirou.
+
+raid_dashboard =
+    .title = Raide em andamento
+    .title_ended = Raide encerrado
+    .description = Começou { $started }
+    .joins = Entradas
+    .checked = Verificados
+    .flagged = Sinalizados
+    .queue = Aguardando na fila
+
+## Application commands, see core.l10n.Translator for how the IDs are built
+
+command-setup =
+    .name = configurar
+    .description = Configure o bot neste servidor
+command-stats =
+    .name = estatisticas
+    .description = Mostra quantos membros entraram e foram sinalizados recentemente
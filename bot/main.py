@@ -1,16 +1,27 @@
 import asyncio
+import datetime
 
 import asyncpg
 import discord
 from aiohttp import ClientSession
-from core.config import Config
+from core.cache import RecentMembersCachePolicy
+from core.command_sync import CommandSyncManager
+from core.config import BotConfig, Config
 from core.logging import setup_logger
 from core.database import PostgresPool
-from discord.ext import commands
+from discord.ext import commands, tasks
 from helpers.context import GatekeeperContext
 from loguru import logger
-from core.config import config
-from core.l10n import Localization
+from core.journal import JoinEventJournal
+from core.l10n import Localization, Translator
+from core.metrics import metrics
+from core.outbox import Outbox
+from core.retention import DepartedGuildsCleaner
+from core.runtime import RuntimeProfile, apply_runtime_profile, create_web_client
+from core.rollups import JoinStatsRollup
+from core.settings import GuildSettingsTable
+from core.startup import StartupTimeline
+from core.watchdog import LoopLagWatchdog
 
 
 class GatekeeperBot(commands.Bot):
@@ -20,11 +31,30 @@ class GatekeeperBot(commands.Bot):
         web_client: ClientSession,
         pool: asyncpg.Pool,
         l10n: Localization,
+        startup_timeline: StartupTimeline | None = None,
     ):
         self.config = config
         self.web_client = web_client
         self.pool = pool
         self.l10n = l10n
+        self.settings = GuildSettingsTable()
+        self.startup_timeline = startup_timeline or StartupTimeline()
+        self.join_journal = JoinEventJournal(pool)
+        self.join_stats = JoinStatsRollup(pool)
+        self.outbox = Outbox(pool)
+        self.loop_watchdog = LoopLagWatchdog()
+        self.departed_guilds_cleaner = DepartedGuildsCleaner(
+            pool, grace_period=datetime.timedelta(days=config.bot.departed_guild_retention_days)
+        )
+
+        # Replaced by _build_command_prefixes once the bot user is known
+        self._command_prefixes: tuple[str, ...] = (self.config.bot.prefix,)
+        self._skipped_bot_messages = metrics.counter(
+            "messages_skipped_bot", "Messages ignored because the author is a bot."
+        )
+        self._skipped_prefix_messages = metrics.counter(
+            "messages_skipped_prefix", "Messages ignored because they do not start with a command prefix."
+        )
 
         allowed_mentions = discord.AllowedMentions(
             roles=False,
@@ -35,14 +65,23 @@ class GatekeeperBot(commands.Bot):
         intents.message_content = True
         intents.members = True
 
+        self.member_cache_policy: RecentMembersCachePolicy | None = None
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+        if self.config.bot.member_cache_hours is not None:
+            self.member_cache_policy = RecentMembersCachePolicy(self.config.bot.member_cache_hours)
+            member_cache_flags = self.member_cache_policy.member_cache_flags()
+
         super().__init__(
             command_prefix=commands.when_mentioned_or(self.config.bot.prefix),
             pm_help=None,
             chunk_guilds_at_startup=False,
             allowed_mentions=allowed_mentions,
             intents=intents,
+            member_cache_flags=member_cache_flags,
             enable_debug_events=True,
         )
+        # The command tree is created by commands.Bot
+        self.command_sync = CommandSyncManager(self.tree, pool)
 
     async def get_or_fetch_guild(self, guild_id: int) -> discord.Guild | None:
         """Looks up a guild in cache or fetches if not found.
@@ -98,42 +137,147 @@ class GatekeeperBot(commands.Bot):
             return None
         return members[0]
 
+    def _build_command_prefixes(self) -> tuple[str, ...]:
+        """Build every prefix that `commands.when_mentioned_or` would accept.
+
+        Returns:
+            tuple[str, ...]: The prefixes, ready to be used with `str.startswith`.
+        """
+        prefixes = [self.config.bot.prefix]
+        if self.user is not None:
+            prefixes += [f"<@{self.user.id}> ", f"<@!{self.user.id}> "]
+        return tuple(prefixes)
+
     async def setup_hook(self):
-        initial_extensions = self.config.bot.initial_cogs
-        if initial_extensions:
-            logger.info("Loading initial extensions.")
-            for extension in initial_extensions:
-                try:
-                    logger.info(f"Loading extension {extension}")
-                    await self.load_extension(extension)
-                except Exception:
-                    logger.exception(f"Error while loading extension {extension}")
+        self._command_prefixes = self._build_command_prefixes()
+        self.loop_watchdog.start()
+        self.join_journal.start()
+        self.join_stats.start()
+        self.departed_guilds_cleaner.start()
+        if self.member_cache_policy is not None:
+            self.prune_member_cache.start()
+
+        # always load jishaku to have at least basic remote control/debug
+        extensions = ["jishaku", *self.config.bot.initial_cogs]
+        logger.info("Loading initial extensions.")
+        # Extensions don't depend on each other, so they are loaded concurrently with the cache warm up
+        with self.startup_timeline.phase("extensions"):
+            _, *loaded = await asyncio.gather(
+                self._warm_up_settings(), *(self._load_initial_extension(ext) for ext in extensions)
+            )
+        if all(loaded):
+            await self._sync_app_commands()
+        else:
+            # The commands of the missing extensions would be deleted from every guild
+            logger.warning("Not syncing the app commands because some extensions failed to load")
+
+        # setup_hook is called after logging in and right before connecting to the gateway
+        self.startup_timeline.start("gateway_connect")
+
+    async def _load_initial_extension(self, extension: str) -> bool:
+        try:
+            logger.info(f"Loading extension {extension}")
+            with self.startup_timeline.phase(f"extension:{extension}", concurrent=True):
+                await self.load_extension(extension)
+        except Exception:
+            logger.exception(f"Error while loading extension {extension}")
+            return False
+        return True
+
+    async def _sync_app_commands(self) -> None:
+        try:
+            with self.startup_timeline.phase("command_sync"):
+                await self.tree.set_translator(Translator(self.l10n))
+                await self.command_sync.sync()
+        except Exception:
+            logger.exception("Error while syncing the app commands")
+
+    async def _warm_up_settings(self) -> None:
+        try:
+            with self.startup_timeline.phase("cache_warmup", concurrent=True):
+                guilds = await self.settings.load(self.pool)
+            logger.info(f"Loaded the settings of {guilds} guilds.")
+        except Exception:
+            # The settings are also loaded on demand, so the bot can still work without this
+            logger.exception("Error while warming up the settings table")
+
+    @tasks.loop(minutes=10)
+    async def prune_member_cache(self):
+        if self.member_cache_policy is not None:
+            self.member_cache_policy.prune(self.guilds)
+
+    @prune_member_cache.before_loop
+    async def before_prune_member_cache(self):
+        await self.wait_until_ready()
+
+    async def close(self):
+        await super().close()
+        try:
+            await self.join_journal.close()
+        except Exception:
+            logger.exception("Error while flushing the join events journal on shutdown")
+        try:
+            await self.join_stats.close()
+        except Exception:
+            logger.exception("Error while flushing the join stats on shutdown")
+        await self.departed_guilds_cleaner.close()
+        await self.outbox.close()
+        await self.loop_watchdog.close()
+
+    async def on_connect(self):
+        if not self.startup_timeline.finished:
+            self.startup_timeline.end("gateway_connect")
+            self.startup_timeline.start("ready")
 
     async def on_ready(self):
+        if not self.startup_timeline.finished:
+            self.startup_timeline.end("ready")
+            self.startup_timeline.finish()
+
+        # The outbox handlers look up guilds and members, so they can only run once the cache is filled
+        self.outbox.start()
+
         if not hasattr(self, "uptime"):
             self.uptime = discord.utils.utcnow()
             logger.info(f"Logged in as {self.user} (ID: {self.user.id})")  # type: ignore
 
     async def on_message(self, message: discord.Message) -> None:
+        # Most of the messages are regular chat, so discard them before
+        # building a context and resolving the prefixes for them.
+        if message.author.bot:
+            self._skipped_bot_messages.inc()
+            return
+        if not message.content.startswith(self._command_prefixes):
+            self._skipped_prefix_messages.inc()
+            return
+
         ctx = await self.get_context(message, cls=GatekeeperContext)
         await self.invoke(ctx)
 
 
-async def main():
+async def main(runtime: RuntimeProfile):
     setup_logger()  # intercept logging and send to loguru
+    logger.info(f"Using the {runtime} runtime profile")
+    timeline = StartupTimeline()
+    # The environment is read when core.config is imported, there is nothing left to time here
+    config = Config()
 
-    l10n = Localization()
-    l10n.load_localization(["en-US"])
-    l10n.load_localization(["pt-BR", "en-US"])
-    l10n.set_default_locale("en-US")
+    with timeline.phase("l10n"):
+        l10n = Localization()
+        l10n.load_localization(["en-US"])
+        l10n.load_localization(["pt-BR", "en-US"])
+        l10n.set_default_locale("en-US")
+        l10n.parse_all()
 
-    async with ClientSession() as aio_client:
+    async with create_web_client(runtime) as aio_client:
+        timeline.start("pool")
         async with PostgresPool(config.db.dsn) as pool:
-            async with GatekeeperBot(config, aio_client, pool, l10n) as bot:
-                # always load jishaku to have at least basic remote control/debug
-                await bot.load_extension("jishaku")
+            timeline.end("pool")
+            async with GatekeeperBot(config, aio_client, pool, l10n, startup_timeline=timeline) as bot:
                 await bot.start(config.bot.token)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # The event loop policy has to be set before asyncio.run creates the loop
+    runtime = apply_runtime_profile(BotConfig().runtime_profile)
+    asyncio.run(main(runtime))
@@ -0,0 +1,17 @@
+-- migrate:up
+
+create table if not exists join_events (
+    guild_id bigint not null,
+    user_id bigint not null,
+    joined_at timestamptz not null,
+    account_age double precision not null,
+    signals jsonb not null default '{}',
+    score real not null,
+    action text not null
+);
+
+create index if not exists join_events_guild_id_joined_at_idx on join_events (guild_id, joined_at);
+
+-- migrate:down
+
+drop table if exists join_events;
@@ -0,0 +1,22 @@
+-- migrate:up
+
+create table if not exists join_stats_minutely (
+    guild_id bigint not null,
+    bucket timestamptz not null,
+    joins int not null default 0,
+    flagged int not null default 0,
+    primary key (guild_id, bucket)
+);
+
+create table if not exists join_stats_hourly (
+    guild_id bigint not null,
+    bucket timestamptz not null,
+    joins int not null default 0,
+    flagged int not null default 0,
+    primary key (guild_id, bucket)
+);
+
+-- migrate:down
+
+drop table if exists join_stats_minutely;
+drop table if exists join_stats_hourly;
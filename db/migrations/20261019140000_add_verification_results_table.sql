@@ -0,0 +1,15 @@
+-- migrate:up
+
+create table if not exists verification_results (
+    challenge text not null primary key,
+    guild_id bigint not null,
+    user_id bigint not null,
+    outcome text not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists verification_results_guild_id_user_id_idx on verification_results (guild_id, user_id);
+
+-- migrate:down
+
+drop table if exists verification_results;
@@ -0,0 +1,7 @@
+-- migrate:up
+
+ALTER TABLE guilds ADD COLUMN left_at TIMESTAMPTZ;
+
+-- migrate:down
+
+ALTER TABLE guilds DROP COLUMN left_at;
@@ -0,0 +1,7 @@
+-- migrate:up
+
+create index if not exists guilds_left_at_idx on guilds (left_at) where left_at is not null;
+
+-- migrate:down
+
+drop index if exists guilds_left_at_idx;
@@ -0,0 +1,12 @@
+-- migrate:up
+
+create table if not exists app_command_syncs (
+    -- 0 for the global commands, the guild ID for the commands of a guild
+    scope bigint not null primary key,
+    payload_hash text not null,
+    synced_at timestamptz not null default now()
+);
+
+-- migrate:down
+
+drop table if exists app_command_syncs;
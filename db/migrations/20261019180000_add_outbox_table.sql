@@ -0,0 +1,19 @@
+-- migrate:up
+
+create table if not exists outbox (
+    id bigserial primary key,
+    kind text not null,
+    guild_id bigint not null,
+    user_id bigint,
+    payload jsonb not null default '{}',
+    attempts int not null default 0,
+    -- When the message can be claimed, pushed forward by the lease and the retry backoff
+    available_at timestamptz not null default now(),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists outbox_available_at_idx on outbox (available_at);
+
+-- migrate:down
+
+drop table if exists outbox;